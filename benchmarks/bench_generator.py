@@ -0,0 +1,100 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sudoku_generator import SudokuGenerator
+
+"""
+Benchmark for SudokuGenerator
+Compares boards generated per second across the fill paths the generator has had:
+the original row/col/box scans with the recursive fill_remaining (both kept below,
+as ScanningSudokuGenerator), the bitmask checks with the same recursive fill
+(RecursiveSudokuGenerator), and the iterative MRV fill_random used now
+
+Usage: python benchmarks/bench_generator.py [seconds per run]
+"""
+
+
+# The fill the generator shipped with: random diagonal boxes, then fill_remaining
+# trying digits in ascending order, one recursive call per cell
+class RecursiveSudokuGenerator(SudokuGenerator):
+    def fill_values(self):
+        self.fill_diagonal()
+        self.fill_remaining(0, self.box_length)
+        self.solution = bytes(self.grid.values)
+
+    # Fills the cells outside the diagonal boxes from (row, col) on, writing with
+    # place/unplace so the masks stay in sync while backtracking
+    # Returns whether the board could be completed
+    def fill_remaining(self, row, col):
+        if col >= self.row_length and row < self.row_length - 1:
+            row += 1
+            col = 0
+        if row >= self.row_length and col >= self.row_length:
+            return True
+        if row < self.box_length:
+            if col < self.box_length:
+                col = self.box_length
+        elif row < self.row_length - self.box_length:
+            if col == int(row // self.box_length * self.box_length):
+                col += self.box_length
+        else:
+            if col == self.row_length - self.box_length:
+                row += 1
+                col = 0
+                if row >= self.row_length:
+                    return True
+
+        for num in range(1, self.row_length + 1):
+            if self.is_valid(row, col, num):
+                self.place(row, col, num)
+                if self.fill_remaining(row, col + 1):
+                    return True
+                self.unplace(row, col)
+        return False
+
+
+# The validity checks the generator shipped with, one linear scan per unit
+class ScanningSudokuGenerator(RecursiveSudokuGenerator):
+    def is_valid(self, row, col, num):
+        for i in range(self.row_length):
+            if self.board[row][i] == num or self.board[i][col] == num:
+                return False
+        row_start = (row // self.box_length) * self.box_length
+        col_start = (col // self.box_length) * self.box_length
+        for i in range(row_start, row_start + self.box_length):
+            for j in range(col_start, col_start + self.box_length):
+                if self.board[i][j] == num:
+                    return False
+        return True
+
+
+# Generates boards for roughly the given number of seconds and returns boards per second
+def boards_per_second(generator_class, removed, seconds, unique=False):
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        sudoku = generator_class(9, removed, unique)
+        sudoku.fill_values()
+        sudoku.remove_cells()
+        count += 1
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 2.0
+    scan = boards_per_second(ScanningSudokuGenerator, 50, seconds)
+    recursive = boards_per_second(RecursiveSudokuGenerator, 50, seconds)
+    iterative = boards_per_second(SudokuGenerator, 50, seconds)
+    print(f"scan, recursive:    {scan:10.1f} boards/s")
+    print(f"bitmask, recursive: {recursive:10.1f} boards/s")
+    print(f"iterative MRV:      {iterative:10.1f} boards/s")
+    print(f"speedup:            {iterative / scan:10.2f}x")
+    unique = boards_per_second(SudokuGenerator, 50, seconds, unique=True)
+    print(f"unique carving:     {unique:10.1f} boards/s ({1000 / unique:.1f} ms/board)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import os
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pygame
+from sudokumain import Board, draw_button, open_window
+
+"""
+Benchmark for Board.draw
+Compares frame time with the render cache against the original path, which built a
+new font and rendered every glyph and button label on each frame (kept below as
+UncachedBoard). Runs on the SDL dummy video driver, so no window is opened.
+
+Also reports the cost of an incremental frame, where one cell changes and only
+Board.draw_dirty runs.
+
+Usage: python benchmarks/bench_render.py [frames]
+"""
+
+
+class UncachedBoard(Board):
+    def draw_buttons(self, screen):
+        button_font = pygame.font.Font(None, 35)
+        for name, label in (
+            ("reset", "Reset"),
+            ("restart", "Restart"),
+            ("exit", "Exit"),
+        ):
+            draw_button(
+                screen,
+                (255, 69, 0),
+                self.buttons[name],
+                label,
+                (255, 255, 255),
+                button_font,
+            )
+
+    def draw_number(self, screen, number, row, col, fixed):
+        font = pygame.font.Font(None, 60)
+        if fixed:
+            color = (0, 0, 0)
+        elif self.is_entered(row, col):
+            color = (0, 0, 139)
+        else:
+            color = (30, 144, 255)
+        text = font.render(str(number), True, color)
+        screen.blit(text, (col * self.cell_size + 20, row * self.cell_size + 10))
+
+
+# Draws the board the given number of times and returns the mean frame time in ms
+def frame_time(board, screen, frames):
+    board.draw(screen)
+    start = time.perf_counter()
+    for _ in range(frames):
+        screen.fill((255, 255, 255))
+        board.draw(screen)
+    return (time.perf_counter() - start) / frames * 1000
+
+
+# Changes one cell per frame and returns the mean draw_dirty time in ms
+def dirty_frame_time(board, screen, frames):
+    board.draw_dirty(screen)
+    start = time.perf_counter()
+    for i in range(frames):
+        board.select(i % 9, (i // 9) % 9)
+        board.sketch(i % 9 + 1)
+        board.draw_dirty(screen)
+    return (time.perf_counter() - start) / frames * 1000
+
+
+def main():
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    screen = open_window()
+    before = frame_time(UncachedBoard(9, 9, "easy"), screen, frames)
+    after = frame_time(Board(9, 9, "easy"), screen, frames)
+    print(f"uncached (before): {before:8.3f} ms/frame")
+    print(f"cached (after):    {after:8.3f} ms/frame")
+    print(f"speedup:           {before / after:8.2f}x")
+    dirty = dirty_frame_time(Board(9, 9, "easy"), screen, frames)
+    print(f"dirty cells only:  {dirty:8.3f} ms/frame")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import os
+import signal
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sudoku_solvers import SOLVERS
+
+"""
+Benchmark for the solvers in sudoku_solvers
+Times count_solutions(limit=2) (a full uniqueness check) for every solver on a corpus
+of hard puzzles and reports mean and worst-case latency. Each solve is cut off after
+a timeout (SIGALRM, so Unix only) and counted at the timeout.
+
+The built-in corpus holds well-known hard puzzles, including one built to defeat
+fixed-order backtracking. Any file with one 81-character puzzle per line ('0' or '.'
+for blanks, e.g. the top95 / hardest collections) can be passed instead.
+
+Usage: python benchmarks/bench_solvers.py [puzzle file] [timeout seconds]
+"""
+
+HARD_PUZZLES = [
+    # Arto Inkala's "world's hardest sudoku" (2012)
+    "800000000003600000070090200050007000000045700000100030001000068008500010090000400",
+    # AI Escargot
+    "100007090030020008009600500005300900010080002600004000300000010040000007007000300",
+    # Golden Nugget
+    "000000039000001005003050800008090006070002000100400000009080050020000600400700000",
+    # Platinum Blonde
+    "000000012000000003002300400001800005060070800000009000008500000900040500470006000",
+    # 17 clues, first row nearly empty: worst case for cell-by-cell backtracking
+    "000000010400000000020000000000050407008000300001090000300400200050100000000806000",
+]
+
+
+class Timeout(Exception):
+    pass
+
+
+def on_alarm(signum, frame):
+    raise Timeout()
+
+
+def load_puzzles(path):
+    puzzles = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if len(line) >= 81:
+                puzzles.append(line[:81])
+    return puzzles
+
+
+# Returns seconds per puzzle, with timed out puzzles counted as timeout
+def time_solver(solver, puzzles, timeout):
+    times = []
+    signal.signal(signal.SIGALRM, on_alarm)
+    for puzzle in puzzles:
+        values = [int(c) if c.isdigit() else 0 for c in puzzle]
+        start = time.perf_counter()
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+        try:
+            solver.count_solutions(values, 2)
+            elapsed = time.perf_counter() - start
+        except Timeout:
+            elapsed = timeout
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+        times.append(elapsed)
+    return times
+
+
+def main():
+    puzzles = load_puzzles(sys.argv[1]) if len(sys.argv) > 1 else HARD_PUZZLES
+    timeout = float(sys.argv[2]) if len(sys.argv) > 2 else 10.0
+    print(f"{len(puzzles)} puzzles, timeout {timeout:.0f} s")
+    for name, solver_class in SOLVERS.items():
+        times = time_solver(solver_class(), puzzles, timeout)
+        timed_out = sum(1 for t in times if t >= timeout)
+        print(
+            f"{name:14s} mean {sum(times) / len(times) * 1000:9.1f} ms"
+            f"   worst {max(times) * 1000:9.1f} ms   timed out {timed_out}"
+        )
+
+
+if __name__ == "__main__":
+    main()
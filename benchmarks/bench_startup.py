@@ -0,0 +1,87 @@
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+"""
+Cold-start benchmark
+Each measurement runs in a fresh interpreter, so nothing is cached in sys.modules:
+- headless import: importing the engine (sudoku_board) and building a board model,
+  checking that pygame never gets imported
+- frontend import: importing sudokumain, which no longer initialises pygame
+- time to first frame: from the start of the script until main() first flips the
+  display (the start menu), on the SDL dummy driver. "eager init" calls pygame.init()
+  first, which is what importing sudokumain used to do
+
+Usage: python benchmarks/bench_startup.py [runs]
+"""
+
+HEADLESS = """
+import sys, time
+start = time.perf_counter()
+import sudoku_board
+sudoku_board.BoardModel(9, 9, "easy")
+assert "pygame" not in sys.modules
+print(time.perf_counter() - start)
+"""
+
+FRONTEND_IMPORT = """
+import time
+start = time.perf_counter()
+import sudokumain
+print(time.perf_counter() - start)
+"""
+
+FIRST_FRAME = """
+import time
+start = time.perf_counter()
+import pygame
+if {eager}:
+    pygame.init()
+import sudokumain
+
+def flip():
+    print(time.perf_counter() - start)
+    raise SystemExit
+
+pygame.display.flip = flip
+sudokumain.main(session_path=None)
+"""
+
+
+# Runs code in a new interpreter and returns the seconds it printed
+def run(code):
+    env = dict(os.environ, SDL_VIDEODRIVER="dummy", SDL_AUDIODRIVER="dummy")
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def median_ms(code, runs):
+    return statistics.median(run(code) for _ in range(runs)) * 1000
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    # One throwaway run so the files are in the OS cache for every measured one
+    run(HEADLESS)
+    results = [
+        ("headless import", median_ms(HEADLESS, runs)),
+        ("frontend import", median_ms(FRONTEND_IMPORT, runs)),
+        ("first frame, eager init", median_ms(FIRST_FRAME.format(eager=True), runs)),
+        ("first frame, lazy init", median_ms(FIRST_FRAME.format(eager=False), runs)),
+    ]
+    for name, ms in results:
+        print(f"{name + ':':26}{ms:8.1f} ms (median of {runs})")
+
+
+if __name__ == "__main__":
+    main()
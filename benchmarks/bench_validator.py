@@ -0,0 +1,99 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from batch_validator import validate_boards
+from sudoku_generator import generate_sudoku
+
+"""
+Benchmark for batch_validator.validate_boards
+Validates a million 9x9 boards in one call and compares against checking boards one at
+a time with Python sets, the way Board.valid_row/valid_col/valid_box do (timed on a
+sample and scaled up, since the full million takes minutes).
+
+The boards are solved grids with their digits relabelled at random, a quarter of them
+with a blanked cell and a quarter with a duplicated value, so all outcomes show up.
+
+Usage: python benchmarks/bench_validator.py [boards]
+"""
+
+
+# One board at a time with sets: the baseline the batch API replaces
+def validate_with_sets(board):
+    values = [int(num) for num in board.ravel()]
+    if any(num > 9 for num in values):
+        return False, all(values)
+    units = [values[r * 9 : r * 9 + 9] for r in range(9)]
+    units += [values[c::9] for c in range(9)]
+    for br in range(0, 9, 3):
+        for bc in range(0, 9, 3):
+            units.append(
+                [values[(br + i) * 9 + bc + j] for i in range(3) for j in range(3)]
+            )
+    valid = True
+    for unit in units:
+        filled = [num for num in unit if num]
+        if len(filled) != len(set(filled)):
+            valid = False
+            break
+    return valid, all(values)
+
+
+def make_boards(count, seed=0):
+    rng = np.random.default_rng(seed)
+    grids = np.array(
+        [
+            np.frombuffer(generate_sudoku(9, 0, seed=s).get_puzzle().solution, np.uint8)
+            for s in range(16)
+        ]
+    ).reshape(-1, 9, 9)
+    boards = grids[rng.integers(len(grids), size=count)]
+    # Relabel digits per board: a random permutation of 1..9, 0 stays 0
+    labels = np.zeros((count, 10), dtype=np.uint8)
+    labels[:, 1:] = rng.permuted(
+        np.tile(np.arange(1, 10, dtype=np.uint8), (count, 1)), axis=1
+    )
+    boards = np.take_along_axis(labels, boards.reshape(count, -1), axis=1).reshape(
+        count, 9, 9
+    )
+    index = np.arange(count)
+    blank = index[rng.random(count) < 0.25]
+    boards[
+        blank, rng.integers(9, size=len(blank)), rng.integers(9, size=len(blank))
+    ] = 0
+    broken = index[rng.random(count) < 0.25]
+    boards[broken, 0, 0] = boards[broken, 0, 1]
+    return boards
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    boards = make_boards(count)
+
+    start = time.perf_counter()
+    valid, complete = validate_boards(boards)
+    batch = time.perf_counter() - start
+
+    sample = boards[: min(count, 20_000)]
+    start = time.perf_counter()
+    expected = [validate_with_sets(board) for board in sample]
+    per_board = (time.perf_counter() - start) / len(sample)
+    assert expected == list(
+        zip(valid[: len(sample)].tolist(), complete[: len(sample)].tolist())
+    )
+
+    print(
+        f"{count} boards: {valid.sum()} valid, {complete.sum()} complete, {(valid & complete).sum()} solved"
+    )
+    print(f"validate_boards   {batch:8.3f} s  ({count / batch / 1e6:.2f} M boards/s)")
+    print(
+        f"Python sets       {per_board * count:8.3f} s  (estimated from {len(sample)} boards)"
+    )
+    print(f"speedup           {per_board * count / batch:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pygame
+from sudoku_generator import DIFFICULTIES, generate_sudoku
+from sudokumain import Board, open_window
+
+"""
+Headless benchmark suite for generation, validation and rendering
+Every run uses the same seeds, so results are comparable between runs and machines
+vary only in speed. Results are written as JSON:
+
+    {"meta": {...}, "results": {"name": {"value": 1.23, "unit": "ms", "better": "lower"}}}
+
+- generate.<difficulty>.*   generate_sudoku(9, removed, unique=True): boards/s, p50, p99
+- validate.*                Board.valid_board, is_full and all_numbers_entered per call,
+                            plus a full valid_row/valid_col/valid_box scan for reference
+- render.*                  Board.draw full frames (p50, p99) and draw_dirty one-cell
+                            frames (mean) on the SDL dummy video driver
+
+Store a baseline once, then compare later runs against it; the exit status is 1 when
+any result is more than --tolerance worse than the baseline:
+
+    python benchmarks/suite.py -o benchmarks/baseline.json
+    python benchmarks/suite.py --baseline benchmarks/baseline.json
+
+benchmarks/baseline.json holds the numbers from the machine the suite was written on;
+regenerate it on the machine that runs the comparison before relying on it.
+"""
+
+SEED = 20240601
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def result(value, unit, better="lower"):
+    return {"value": value, "unit": unit, "better": better}
+
+
+# Each seed is generated repeats times and its fastest run kept: the work per seed is
+# fixed, so anything slower than the fastest run is noise from the machine
+def bench_generation(boards, repeats=3):
+    results = {}
+    for difficulty, removed in DIFFICULTIES.items():
+        latencies = []
+        for i in range(boards):
+            fastest = float("inf")
+            for _ in range(repeats):
+                start = time.perf_counter()
+                generate_sudoku(9, removed, unique=True, seed=SEED + i)
+                fastest = min(fastest, time.perf_counter() - start)
+            latencies.append(fastest * 1000)
+        name = f"generate.{difficulty}"
+        throughput = boards * 1000 / sum(latencies)
+        results[f"{name}.throughput"] = result(throughput, "boards/s", "higher")
+        results[f"{name}.p50"] = result(percentile(latencies, 0.5), "ms")
+        results[f"{name}.p99"] = result(percentile(latencies, 0.99), "ms")
+    return results
+
+
+# Mean time of one call of check in microseconds, over enough calls to be stable
+def time_call(check, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        check()
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def bench_validation(board, calls):
+    def scan_units():
+        step = board.box_length
+        return (
+            all(board.valid_row(i) for i in range(board.rows))
+            and all(board.valid_col(i) for i in range(board.cols))
+            and all(
+                board.valid_box(row, col)
+                for row in range(0, board.rows, step)
+                for col in range(0, board.cols, step)
+            )
+        )
+
+    return {
+        "validate.valid_board": result(time_call(board.valid_board, calls), "us"),
+        "validate.is_full": result(time_call(board.is_full, calls), "us"),
+        "validate.all_numbers_entered": result(
+            time_call(board.all_numbers_entered, calls), "us"
+        ),
+        "validate.scan_units": result(time_call(scan_units, calls // 100 or 1), "us"),
+    }
+
+
+def bench_rendering(screen, frames):
+    board = Board(9, 9, "easy", store=None)
+    board.draw(screen)
+    full = []
+    for _ in range(frames):
+        start = time.perf_counter()
+        board.draw(screen)
+        full.append((time.perf_counter() - start) * 1000)
+    board.draw_dirty(screen)
+    dirty = []
+    for i in range(frames):
+        board.select(i % 9, (i // 9) % 9)
+        board.sketch(i % 9 + 1)
+        start = time.perf_counter()
+        board.draw_dirty(screen)
+        dirty.append((time.perf_counter() - start) * 1000)
+    return {
+        "render.draw.p50": result(percentile(full, 0.5), "ms"),
+        "render.draw.p99": result(percentile(full, 0.99), "ms"),
+        # One-cell frames take tens of microseconds, where p99 is mostly scheduler
+        # noise, so the mean is what gets compared
+        "render.draw_dirty.mean": result(sum(dirty) / len(dirty), "ms"),
+    }
+
+
+# Board for the validation runs: seeded, half filled in so the checks see real data
+def validation_board():
+    sudoku = generate_sudoku(9, DIFFICULTIES["medium"], unique=True, seed=SEED)
+    board = Board(9, 9)
+    board.grid.restore(sudoku.grid)
+    board.grid.fix_givens()
+    board.solution = sudoku.solution
+    board.recount()
+    return board
+
+
+def run(quick=False):
+    boards = 20 if quick else 200
+    calls = 20_000 if quick else 500_000
+    frames = 50 if quick else 500
+    screen = open_window()
+    results = {}
+    results.update(bench_generation(boards))
+    results.update(bench_validation(validation_board(), calls))
+    results.update(bench_rendering(screen, frames))
+    return {
+        "meta": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "machine": platform.machine(),
+            "quick": quick,
+        },
+        "results": results,
+    }
+
+
+# Returns (name, baseline value, current value, change, regressed) per shared result;
+# change is how much worse the current value is, as a fraction of the baseline
+def compare(baseline, current, tolerance):
+    rows = []
+    for name, now in current["results"].items():
+        before = baseline["results"].get(name)
+        if before is None or not before["value"]:
+            continue
+        change = (now["value"] - before["value"]) / before["value"]
+        if now["better"] == "higher":
+            change = -change
+        rows.append((name, before["value"], now["value"], change, change > tolerance))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless benchmark suite")
+    parser.add_argument("-o", "--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="fraction worse than the baseline that counts as a regression",
+    )
+    parser.add_argument("--quick", action="store_true", help="fewer iterations")
+    args = parser.parse_args(argv)
+
+    current = run(args.quick)
+    for name, data in current["results"].items():
+        print(f"{name:32} {data['value']:12.3f} {data['unit']}", file=sys.stderr)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(current, f, indent=2, sort_keys=True)
+    else:
+        print(json.dumps(current, indent=2, sort_keys=True))
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        rows = compare(baseline, current, args.tolerance)
+        print(f"\ncompared with {args.baseline} (+ is worse):", file=sys.stderr)
+        for name, before, now, change, regressed in rows:
+            flag = "REGRESSION" if regressed else ""
+            print(
+                f"{name:32} {before:12.3f} -> {now:12.3f} {change:+8.1%} {flag}",
+                file=sys.stderr,
+            )
+        if any(row[4] for row in rows):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+import math
+
+"""
+Compact board storage: one byte per cell for the value and one byte per cell for flags.
+
+A 9x9 board is two 81-byte bytearrays instead of a list of lists of ints, so copying
+or resetting a board is a single buffer copy per array. board.rows gives writable
+memoryview rows, so existing code can keep indexing board.rows[row][col].
+"""
+
+# Flag bits stored per cell in CompactBoard.flags
+FIXED = 1  # given by the puzzle, cannot be changed by the player
+ENTERED = 2  # value was confirmed with return
+
+
+class CompactBoard:
+    def __init__(self, size=9, values=None, flags=None):
+        self.size = size
+        self.box_length = math.isqrt(size)
+        cells = size * size
+        self.values = bytearray(values) if values is not None else bytearray(cells)
+        self.flags = bytearray(flags) if flags is not None else bytearray(cells)
+        if len(self.values) != cells or len(self.flags) != cells:
+            raise ValueError(f"expected {cells} cells for a {size}x{size} board")
+        self._make_rows()
+
+    # Builds a board from a 2D list (or any rows of ints); non-zero cells can be marked fixed
+    @classmethod
+    def from_rows(cls, rows, fix_givens=False):
+        board = cls(len(rows), bytearray(num for row in rows for num in row))
+        if fix_givens:
+            board.fix_givens()
+        return board
+
+    def _make_rows(self):
+        view = memoryview(self.values)
+        size = self.size
+        self.rows = [view[row * size : (row + 1) * size] for row in range(size)]
+
+    # memoryviews can't be pickled, so only the buffers are sent to other processes
+    def __getstate__(self):
+        return self.size, bytes(self.values), bytes(self.flags)
+
+    def __setstate__(self, state):
+        size, values, flags = state
+        self.__init__(size, values, flags)
+
+    def __eq__(self, other):
+        if not isinstance(other, CompactBoard):
+            return NotImplemented
+        return self.values == other.values and self.flags == other.flags
+
+    def get(self, row, col):
+        return self.values[row * self.size + col]
+
+    def set(self, row, col, num):
+        self.values[row * self.size + col] = num
+
+    def row(self, row):
+        return self.rows[row]
+
+    # Column and box views are copies, since they are not contiguous in the buffer
+    def col(self, col):
+        return self.values[col :: self.size]
+
+    def box(self, index):
+        box_length = self.box_length
+        row_start = (index // box_length) * box_length
+        col_start = (index % box_length) * box_length
+        return bytes(
+            self.values[row * self.size + col]
+            for row in range(row_start, row_start + box_length)
+            for col in range(col_start, col_start + box_length)
+        )
+
+    def has_flag(self, row, col, flag):
+        return bool(self.flags[row * self.size + col] & flag)
+
+    def set_flag(self, row, col, flag, on=True):
+        index = row * self.size + col
+        if on:
+            self.flags[index] |= flag
+        else:
+            self.flags[index] &= ~flag
+
+    # Marks every non-zero cell FIXED and clears all other flags
+    def fix_givens(self):
+        self.flags[:] = bytes(FIXED if num else 0 for num in self.values)
+
+    # Independent copy of the board
+    def copy(self):
+        return CompactBoard(self.size, self.values, self.flags)
+
+    # Overwrites this board with other in place, keeping existing row views valid
+    def restore(self, other):
+        self.values[:] = other.values
+        self.flags[:] = other.flags
+
+    # Plain 2D list of the values, e.g. for printing or comparing with older code
+    def to_lists(self):
+        return [list(row) for row in self.rows]
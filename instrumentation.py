@@ -0,0 +1,200 @@
+import json
+import logging
+import math
+import threading
+import time
+from contextlib import nullcontext
+
+"""
+Opt-in timings and counters for the generator and the game loop.
+
+Everything goes through the module-level metrics object. It starts disabled: timer()
+then hands back a shared do-nothing context manager and add() returns straight away,
+so instrumented code costs one attribute check per stage. Enable it with
+metrics.enable() (or run sudokumain.py with --profile).
+
+Timings are kept as log-scale histograms (buckets 25% apart, from 1 us up) plus count,
+total and max, so memory stays the same however long the game runs. Percentiles are
+read from the buckets, so they are accurate to within one bucket.
+
+Example:
+    metrics.enable()
+    generate_sudoku(9, 50, unique=True)
+    print(metrics.to_json())
+    print(metrics.format_histogram("generator.generate"))
+"""
+
+# Upper bound of bucket i is BUCKET_START_MS * BUCKET_RATIO ** i
+BUCKET_START_MS = 0.001
+BUCKET_RATIO = 1.25
+BUCKETS = 100
+
+_NULL_TIMER = nullcontext()
+
+
+class Timing:
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * BUCKETS
+
+    def add(self, ms):
+        self.count += 1
+        self.total_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+        if ms <= BUCKET_START_MS:
+            index = 0
+        else:
+            index = math.ceil(math.log(ms / BUCKET_START_MS, BUCKET_RATIO))
+        self.buckets[min(index, BUCKETS - 1)] += 1
+
+    # Upper bound (ms) of the bucket holding the fraction-th sample, e.g. 0.99 for p99
+    def percentile(self, fraction):
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(fraction * self.count))
+        seen = 0
+        for index, hits in enumerate(self.buckets):
+            seen += hits
+            if seen >= rank:
+                return min(BUCKET_START_MS * BUCKET_RATIO**index, self.max_ms)
+        return self.max_ms
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "total_ms": self.total_ms,
+            "mean_ms": self.total_ms / self.count if self.count else 0.0,
+            "p50_ms": self.percentile(0.5),
+            "p90_ms": self.percentile(0.9),
+            "p99_ms": self.percentile(0.99),
+            "max_ms": self.max_ms,
+        }
+
+    # Non-empty buckets as (upper bound in ms, samples)
+    def histogram(self):
+        return [
+            (BUCKET_START_MS * BUCKET_RATIO**index, hits)
+            for index, hits in enumerate(self.buckets)
+            if hits
+        ]
+
+
+class _Timer:
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, (time.perf_counter() - self.start) * 1000)
+
+
+class Metrics:
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self.reset()
+
+    def enable(self, on=True):
+        self.enabled = on
+
+    # Drops everything recorded so far
+    def reset(self):
+        with self._lock:
+            self.counters = {}
+            self.timings = {}
+            self.started = time.perf_counter()
+
+    # Times the with block under name
+    def timer(self, name):
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name)
+
+    # Records a duration in milliseconds under name
+    def observe(self, name, ms):
+        if not self.enabled:
+            return
+        with self._lock:
+            timing = self.timings.get(name)
+            if timing is None:
+                timing = self.timings[name] = Timing()
+            timing.add(ms)
+
+    # Adds value to the counter name
+    def add(self, name, value=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def snapshot(self, histograms=False):
+        with self._lock:
+            data = {
+                "elapsed_s": time.perf_counter() - self.started,
+                "counters": dict(self.counters),
+                "timings": {
+                    name: timing.summary() for name, timing in self.timings.items()
+                },
+            }
+            if histograms:
+                data["histograms"] = {
+                    name: timing.histogram() for name, timing in self.timings.items()
+                }
+        return data
+
+    def to_json(self, histograms=True):
+        return json.dumps(self.snapshot(histograms), indent=2, sort_keys=True)
+
+    def dump(self, path):
+        with open(path, "w") as f:
+            f.write(self.to_json())
+
+    # One line with the count, mean and p99 of every timing and every counter
+    def log_line(self):
+        data = self.snapshot()
+        parts = [
+            f"{name}={summary['count']}x{summary['mean_ms']:.2f}ms"
+            f"(p99 {summary['p99_ms']:.2f})"
+            for name, summary in sorted(data["timings"].items())
+        ]
+        parts += [f"{name}={value}" for name, value in sorted(data["counters"].items())]
+        return " ".join(parts)
+
+    # Text histogram of the timing name, one bar per non-empty bucket
+    def format_histogram(self, name, width=40):
+        timing = self.timings.get(name)
+        if timing is None or not timing.count:
+            return f"{name}: no samples"
+        rows = timing.histogram()
+        tallest = max(hits for _, hits in rows)
+        lines = [f"{name} ({timing.count} samples)"]
+        for upper, hits in rows:
+            bar = "#" * max(1, round(hits * width / tallest))
+            lines.append(f"  <= {upper:10.3f} ms {hits:8d} {bar}")
+        return "\n".join(lines)
+
+
+metrics = Metrics()
+
+
+# Logs metrics.log_line() every interval seconds from a daemon thread, while enabled
+def start_periodic_log(interval, logger=None):
+    logger = logger or logging.getLogger("sudoku")
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval):
+            if metrics.enabled:
+                logger.info("metrics %s", metrics.log_line())
+
+    threading.Thread(target=run, name="metrics-log", daemon=True).start()
+    return stop
@@ -0,0 +1,106 @@
+import struct
+
+"""
+Undo/redo history for a CompactBoard, stored as per-move deltas.
+
+Each move is one fixed-size record in a bytearray: the cell index, its value before and
+after, and its flags before and after. Undo and redo move a cursor over the records and
+hand back the cell's old or new state, so both are O(1) and no board is ever copied.
+
+The history starts from a base board. Once more than capacity moves are kept, the
+oldest are folded into the base and dropped, so memory stays flat however long a game
+runs. replay rebuilds the board after any kept move from the base and the deltas.
+"""
+
+# cell index, old value, new value, old flags, new flags
+MOVE = struct.Struct("<HBBBB")
+
+
+class MoveHistory:
+    def __init__(self, base, capacity=100_000):
+        self.capacity = capacity
+        self.reset(base)
+
+    # Forgets every move and starts again from a copy of base
+    def reset(self, base):
+        self.base = base.copy()
+        self.moves = bytearray()
+        # Moves before the cursor are done, moves after it can be redone
+        self.cursor = 0
+        # Moves already folded into base, so positions stay the same after folding
+        self.folded = 0
+
+    def __len__(self):
+        return len(self.moves) // MOVE.size
+
+    # Number of moves made since the start of the game, counting folded ones
+    @property
+    def position(self):
+        return self.folded + self.cursor
+
+    def can_undo(self):
+        return self.cursor > 0
+
+    def can_redo(self):
+        return self.cursor < len(self)
+
+    # Records a move made at cell (row * size + col). Any undone moves are dropped
+    def record(self, cell, old, new, old_flags, new_flags):
+        if old == new and old_flags == new_flags:
+            return
+        del self.moves[self.cursor * MOVE.size :]
+        self.moves += MOVE.pack(cell, old, new, old_flags, new_flags)
+        self.cursor += 1
+        # Fold a quarter of the capacity at a time so the cost per move stays O(1)
+        if self.cursor > self.capacity:
+            self._fold(max(1, self.capacity // 4))
+
+    # Steps back one move. Returns (cell, value, flags) to put back, or None
+    def undo(self):
+        if not self.can_undo():
+            return None
+        self.cursor -= 1
+        cell, old, _, old_flags, _ = MOVE.unpack_from(
+            self.moves, self.cursor * MOVE.size
+        )
+        return cell, old, old_flags
+
+    # Steps forward one move. Returns (cell, value, flags) to apply, or None
+    def redo(self):
+        if not self.can_redo():
+            return None
+        cell, _, new, _, new_flags = MOVE.unpack_from(
+            self.moves, self.cursor * MOVE.size
+        )
+        self.cursor += 1
+        return cell, new, new_flags
+
+    # Yields (cell, old, new, old_flags, new_flags) for every kept move, done or undone
+    def __iter__(self):
+        return MOVE.iter_unpack(self.moves)
+
+    # Returns a new board as it was after move number position (default: the current
+    # one). Positions older than the folded moves can no longer be rebuilt
+    def replay(self, position=None):
+        if position is None:
+            position = self.position
+        if not self.folded <= position <= self.folded + len(self):
+            raise IndexError(f"move {position} is not in the history")
+        board = self.base.copy()
+        self._apply(board, position - self.folded)
+        return board
+
+    def _apply(self, board, count):
+        values = board.values
+        flags = board.flags
+        for cell, _, new, _, new_flags in MOVE.iter_unpack(
+            self.moves[: count * MOVE.size]
+        ):
+            values[cell] = new
+            flags[cell] = new_flags
+
+    def _fold(self, count):
+        self._apply(self.base, count)
+        del self.moves[: count * MOVE.size]
+        self.cursor -= count
+        self.folded += count
@@ -0,0 +1,97 @@
+import queue
+import threading
+
+"""
+Keeps a bounded queue of ready-made puzzles per difficulty so the game never has to
+generate a board inside the event loop.
+
+A background thread tops each queue back up to high_water whenever a queue drops
+below low_water. If a queue is empty when a puzzle is requested the puzzle is
+generated synchronously instead, and counted as a fallback.
+"""
+
+
+class PuzzlePool:
+    # difficulties maps a difficulty name to the number of cells to remove
+    # generate is called as generate(size, removed) and must return a new board
+    def __init__(self, generate, difficulties, size=9, low_water=2, high_water=5):
+        if not 0 <= low_water <= high_water or high_water < 1:
+            raise ValueError("need 0 <= low_water <= high_water and high_water >= 1")
+        self.generate = generate
+        self.difficulties = dict(difficulties)
+        self.size = size
+        self.low_water = low_water
+        self.high_water = high_water
+        self.queues = {
+            difficulty: queue.Queue(maxsize=high_water)
+            for difficulty in self.difficulties
+        }
+        self.hits = 0
+        self.fallbacks = 0
+        self._refill = threading.Event()
+        self._stop = threading.Event()
+        self._worker = None
+
+    # Starts the background refill thread, which fills every queue up to high_water
+    def start(self):
+        if self._worker is not None:
+            return
+        self._stop.clear()
+        self._worker = threading.Thread(
+            target=self._run, name="puzzle-pool", daemon=True
+        )
+        self._worker.start()
+        self._refill.set()
+
+    # Stops the refill thread, waiting for the board it is generating to finish
+    def stop(self):
+        if self._worker is None:
+            return
+        self._stop.set()
+        self._refill.set()
+        self._worker.join()
+        self._worker = None
+
+    # Returns a ready puzzle for difficulty, generating one on the spot if the queue is empty
+    def get(self, difficulty):
+        removed = self.difficulties[difficulty]
+        pending = self.queues[difficulty]
+        try:
+            board = pending.get_nowait()
+            self.hits += 1
+        except queue.Empty:
+            board = self.generate(self.size, removed)
+            self.fallbacks += 1
+        if pending.qsize() < self.low_water:
+            self._refill.set()
+        return board
+
+    # Hit/fallback counters plus how many puzzles are currently waiting per difficulty
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "fallbacks": self.fallbacks,
+            "ready": {
+                difficulty: pending.qsize()
+                for difficulty, pending in self.queues.items()
+            },
+        }
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._refill.wait()
+            self._refill.clear()
+            # Keep going round the difficulties until every queue is at high_water,
+            # one board at a time so a just-emptied queue is never starved by another
+            filled_any = True
+            while filled_any and not self._stop.is_set():
+                filled_any = False
+                for difficulty, removed in self.difficulties.items():
+                    pending = self.queues[difficulty]
+                    if pending.full() or self._stop.is_set():
+                        continue
+                    try:
+                        pending.put_nowait(self.generate(self.size, removed))
+                    except queue.Full:
+                        continue
+                    filled_any = True
@@ -0,0 +1,269 @@
+import argparse
+import hashlib
+import math
+import mmap
+import random
+import struct
+import sys
+import time
+
+from sudoku_generator import DIFFICULTIES, Puzzle, removed_for
+from sudoku_solvers import SOLVERS
+
+"""
+Binary puzzle bank: fixed-size records that can be memory-mapped and read at random.
+
+File layout (little endian):
+    header   magic b"SDKB", version, board size, bits per cell, record size,
+             number of records, number of difficulties
+    index    one entry per difficulty: name (16 bytes, NUL padded), first record, count
+    records  grouped by difficulty, each: givens, solution (packed cells), seed (u64),
+             grade score (u16, capped), padded to a multiple of 8 bytes
+
+Cells are packed two per byte for boards up to 15x15 and one per byte above that.
+Fetching a puzzle is a slice of the map plus unpacking, with no parsing of the file.
+"""
+
+MAGIC = b"SDKB"
+VERSION = 1
+HEADER = struct.Struct("<4sHBBIQI")
+INDEX_ENTRY = struct.Struct("<16sQQ")
+TRAILER = struct.Struct("<QH")  # seed, grade score
+MAX_SCORE = 0xFFFF
+
+
+def cell_bits_for(size):
+    return 4 if size <= 15 else 8
+
+
+def packed_length(size):
+    cells = size * size
+    return (cells + 1) // 2 if cell_bits_for(size) == 4 else cells
+
+
+def record_size_for(size):
+    length = 2 * packed_length(size) + TRAILER.size
+    return (length + 7) // 8 * 8
+
+
+# Packs one value per cell (bytes-like) into the record's cell encoding
+def pack_cells(values, size):
+    if cell_bits_for(size) == 8:
+        return bytes(values)
+    packed = bytearray(packed_length(size))
+    for i, num in enumerate(values):
+        packed[i >> 1] |= num << (4 * (i & 1))
+    return bytes(packed)
+
+
+def unpack_cells(packed, size):
+    if cell_bits_for(size) == 8:
+        return bytes(packed[: size * size])
+    values = bytearray(size * size)
+    for i in range(size * size):
+        values[i] = (packed[i >> 1] >> (4 * (i & 1))) & 0xF
+    return bytes(values)
+
+
+# Writes a store. entries maps a difficulty name to an iterable of (Puzzle, score)
+# pairs, which is consumed one record at a time, so generators stream straight to disk
+# The header and index go in first with zero counts and are rewritten at the end
+def write_store(path, size, entries):
+    record_size = record_size_for(size)
+    length = packed_length(size)
+    names = list(entries)
+    for name in names:
+        if len(name.encode()) > 16:
+            raise ValueError(f"difficulty name too long: {name!r}")
+
+    def write_header(f, counts):
+        f.write(
+            HEADER.pack(
+                MAGIC,
+                VERSION,
+                size,
+                cell_bits_for(size),
+                record_size,
+                sum(counts),
+                len(names),
+            )
+        )
+        start = 0
+        for name, count in zip(names, counts):
+            f.write(INDEX_ENTRY.pack(name.encode(), start, count))
+            start += count
+
+    with open(path, "wb") as f:
+        write_header(f, [0] * len(names))
+        padding = b"\0" * (record_size - 2 * length - TRAILER.size)
+        counts = []
+        for name in names:
+            count = 0
+            for puzzle, score in entries[name]:
+                f.write(pack_cells(puzzle.givens, size))
+                f.write(pack_cells(puzzle.solution, size))
+                f.write(TRAILER.pack(puzzle.seed, min(score, MAX_SCORE)))
+                f.write(padding)
+                count += 1
+            counts.append(count)
+        f.seek(0)
+        write_header(f, counts)
+    return sum(counts)
+
+
+class PuzzleStore:
+    # Opens and memory-maps the store at path
+    def __init__(self, path, rng=None):
+        self.path = path
+        self.rng = rng or random.Random()
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, size, cell_bits, record_size, total, names = HEADER.unpack_from(
+            self.map, 0
+        )
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} puzzle store")
+        if cell_bits != cell_bits_for(size) or record_size != record_size_for(size):
+            raise ValueError(f"{path} has an unexpected record layout")
+        self.size = size
+        self.record_size = record_size
+        self.total = total
+        self.packed_length = packed_length(size)
+        self.index = {}
+        offset = HEADER.size
+        for _ in range(names):
+            name, start, count = INDEX_ENTRY.unpack_from(self.map, offset)
+            self.index[name.rstrip(b"\0").decode()] = (start, count)
+            offset += INDEX_ENTRY.size
+        self.records_offset = offset
+        # Per difficulty draw state: (first position, stride, how many drawn so far)
+        self.draws = {}
+
+    def close(self):
+        self.map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def difficulties(self):
+        return list(self.index)
+
+    def count(self, difficulty):
+        return self.index.get(difficulty, (0, 0))[1]
+
+    # Returns (Puzzle, score) for the index-th puzzle of difficulty
+    def get(self, difficulty, index):
+        start, count = self.index[difficulty]
+        if not 0 <= index < count:
+            raise IndexError(index)
+        offset = self.records_offset + (start + index) * self.record_size
+        length = self.packed_length
+        record = self.map[offset : offset + self.record_size]
+        givens = unpack_cells(record[:length], self.size)
+        solution = unpack_cells(record[length : 2 * length], self.size)
+        seed, score = TRAILER.unpack_from(record, 2 * length)
+        return Puzzle(givens, solution, seed), score
+
+    # Returns a random (Puzzle, score) of difficulty, possibly one returned before
+    def random(self, difficulty):
+        return self.get(difficulty, self.rng.randrange(self.count(difficulty)))
+
+    # Returns a Puzzle of difficulty not drawn before in this session, or None once
+    # every puzzle of that difficulty has been drawn. The order is a random start and a
+    # stride coprime with the count, so it visits every record once without a list
+    def draw(self, difficulty):
+        count = self.count(difficulty)
+        if count == 0:
+            return None
+        state = self.draws.get(difficulty)
+        if state is None:
+            stride = self.rng.randrange(1, count + 1)
+            while math.gcd(stride, count) != 1:
+                stride += 1
+            state = [self.rng.randrange(count), stride, 0]
+            self.draws[difficulty] = state
+        first, stride, drawn = state
+        if drawn >= count:
+            return None
+        state[2] += 1
+        return self.get(difficulty, (first + drawn * stride) % count)[0]
+
+
+# Base seed for one difficulty of a store built from seed. Hashing keeps the
+# difficulties from sharing solution grids, and keeps a store's puzzles apart from
+# those sudoku_batch writes for small --seed values
+def store_seed(seed, difficulty):
+    digest = hashlib.blake2b(f"store:{seed}:{difficulty}".encode(), digest_size=8)
+    return int.from_bytes(digest.digest(), "little")
+
+
+# Builds a store with count puzzles per difficulty using the batch generator
+# Puzzles are graded in the workers and written as their chunks arrive, so memory use
+# does not grow with count. Returns the number of puzzles written
+def build_store(path, count, size=9, workers=None, seed=None, solver=None):
+    from sudoku_batch import generate_puzzles
+
+    def graded(difficulty):
+        for chunk in generate_puzzles(
+            count,
+            removed_for(difficulty, size),
+            size=size,
+            workers=workers,
+            seed=None if seed is None else store_seed(seed, difficulty),
+            ordered=True,
+            graded=True,
+            solver=solver,
+        ):
+            yield from chunk
+
+    return write_store(
+        path, size, {difficulty: graded(difficulty) for difficulty in DIFFICULTIES}
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or inspect a puzzle store")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="generate a new store")
+    build.add_argument("path")
+    build.add_argument(
+        "-n", "--count", type=int, default=1000, help="puzzles per difficulty"
+    )
+    build.add_argument("--size", type=int, default=9)
+    build.add_argument("-j", "--workers", type=int)
+    build.add_argument("--seed", type=int)
+    build.add_argument(
+        "--solver",
+        choices=sorted(SOLVERS),
+        help="fill and check boards with this solver (default: built-in search)",
+    )
+    info = commands.add_parser("info", help="show what a store holds")
+    info.add_argument("path")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        if args.size < 1 or math.isqrt(args.size) ** 2 != args.size:
+            build.error("--size must be a perfect square: 4, 9, 16 or 25")
+        start = time.perf_counter()
+        total = build_store(
+            args.path, args.count, args.size, args.workers, args.seed, args.solver
+        )
+        elapsed = time.perf_counter() - start
+        print(
+            f"wrote {total} puzzles to {args.path} in {elapsed:.1f} s", file=sys.stderr
+        )
+    else:
+        with PuzzleStore(args.path) as store:
+            print(
+                f"{store.size}x{store.size}, {store.total} puzzles, {store.record_size} bytes each"
+            )
+            for difficulty in store.difficulties:
+                print(f"  {difficulty}: {store.count(difficulty)}")
+
+
+if __name__ == "__main__":
+    main()
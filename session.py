@@ -0,0 +1,219 @@
+import logging
+import os
+import struct
+import threading
+import zlib
+from collections import namedtuple
+
+from compact_board import CompactBoard
+from move_history import MOVE, MoveHistory
+
+"""
+Saving and restoring a game in progress as a compact binary snapshot.
+
+Layout (little endian):
+    header    magic b"SDKS", format version, board size, flag bits, selected cell
+              (row * size + col, 0xFFFF for none), mistakes, moves folded into the
+              history base, history cursor, number of moves kept
+    cells     givens, current values, current flags and the solution, one byte per cell
+    base      history base values and flags, only when moves have been folded into it
+    moves     the move history records (see move_history.py)
+    checksum  CRC-32 of everything before it
+
+A 9x9 game is a few hundred bytes plus 6 bytes per move. Autosaver writes snapshots
+from a background thread, so the game loop only pays for packing one.
+"""
+
+MAGIC = b"SDKS"
+VERSION = 1
+HEADER = struct.Struct("<4sHBBHHIII")
+CHECKSUM = struct.Struct("<I")
+HAS_BASE = 1
+NO_CELL = 0xFFFF
+
+logger = logging.getLogger("sudoku")
+
+# original is the board as dealt, grid the board as it is now, solution the solved grid
+# as bytes, selected a (row, col) or None, history a MoveHistory
+Session = namedtuple("Session", "original grid solution selected mistakes history")
+
+
+def pack_session(session):
+    size = session.grid.size
+    history = session.history
+    folded = history.folded > 0
+    selected = NO_CELL
+    if session.selected is not None:
+        row, col = session.selected
+        selected = row * size + col
+    parts = [
+        HEADER.pack(
+            MAGIC,
+            VERSION,
+            size,
+            HAS_BASE if folded else 0,
+            selected,
+            min(session.mistakes, 0xFFFF),
+            history.folded,
+            history.cursor,
+            len(history),
+        ),
+        session.original.values,
+        session.grid.values,
+        session.grid.flags,
+        session.solution,
+    ]
+    if folded:
+        parts += [history.base.values, history.base.flags]
+    parts.append(history.moves)
+    data = b"".join(parts)
+    return data + CHECKSUM.pack(zlib.crc32(data))
+
+
+# Raises ValueError if data is not a snapshot this version can read or is corrupted
+def unpack_session(data):
+    if len(data) < HEADER.size + CHECKSUM.size:
+        raise ValueError("session data is truncated")
+    (checksum,) = CHECKSUM.unpack_from(data, len(data) - CHECKSUM.size)
+    if zlib.crc32(memoryview(data)[: -CHECKSUM.size]) != checksum:
+        raise ValueError("session checksum does not match")
+    magic, version, size, flags, selected, mistakes, folded, cursor, count = (
+        HEADER.unpack_from(data, 0)
+    )
+    if magic != MAGIC:
+        raise ValueError("not a saved session")
+    if version != VERSION:
+        raise ValueError(f"unsupported session version {version}")
+    cells = size * size
+    blocks = 6 if flags & HAS_BASE else 4
+    if len(data) != HEADER.size + blocks * cells + count * MOVE.size + CHECKSUM.size:
+        raise ValueError("session data has the wrong length")
+    if cursor > count or (selected != NO_CELL and selected >= cells):
+        raise ValueError("session data is inconsistent")
+
+    offset = HEADER.size
+
+    def block(length):
+        nonlocal offset
+        offset += length
+        return data[offset - length : offset]
+
+    original = CompactBoard(size, block(cells))
+    original.fix_givens()
+    grid = CompactBoard(size, block(cells), block(cells))
+    solution = bytes(block(cells))
+    base = (
+        CompactBoard(size, block(cells), block(cells)) if flags & HAS_BASE else original
+    )
+    history = MoveHistory(base)
+    history.moves = bytearray(block(count * MOVE.size))
+    history.cursor = cursor
+    history.folded = folded
+    if selected == NO_CELL:
+        selected = None
+    else:
+        selected = divmod(selected, size)
+    return Session(original, grid, solution, selected, mistakes, history)
+
+
+# Writes data to path atomically: a crash mid-write leaves the previous save intact
+def save_session(path, data):
+    temp = path + ".tmp"
+    with open(temp, "wb") as f:
+        f.write(data)
+    os.replace(temp, path)
+
+
+# Returns the Session saved at path, or None if there is none or it cannot be read
+def load_session(path):
+    try:
+        with open(path, "rb") as f:
+            return unpack_session(f.read())
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as error:
+        logger.warning("ignoring saved session %s: %s", path, error)
+        return None
+
+
+class Autosaver:
+    # Writes the newest snapshot handed to submit at most once every interval seconds
+    def __init__(self, path, interval=2.0):
+        self.path = path
+        self.interval = interval
+        self.saves = 0
+        # _lock only guards the pending snapshot, so submit never waits on the disk;
+        # _write_lock keeps writes and deletes in order. save and discard bump
+        # _generation so a snapshot the thread already picked up is not written after them
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._pending = None
+        self._generation = 0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._worker = None
+
+    def start(self):
+        if self._worker is not None:
+            return
+        self._stop.clear()
+        self._worker = threading.Thread(target=self._run, name="autosave", daemon=True)
+        self._worker.start()
+
+    # Stops the thread after writing anything still pending
+    def stop(self):
+        if self._worker is None:
+            return
+        self._stop.set()
+        self._wake.set()
+        self._worker.join()
+        self._worker = None
+
+    # Queues data to be written in the background, replacing any older pending snapshot
+    def submit(self, data):
+        with self._lock:
+            self._pending = data
+        self._wake.set()
+
+    # Writes data right away, for when the game is about to close
+    def save(self, data):
+        self._cancel()
+        with self._write_lock:
+            self._write(data)
+
+    # Deletes the saved session, for a game that has finished
+    def discard(self):
+        self._cancel()
+        with self._write_lock:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+    def _cancel(self):
+        with self._lock:
+            self._pending = None
+            self._generation += 1
+
+    def _write(self, data):
+        try:
+            save_session(self.path, data)
+            self.saves += 1
+        except OSError as error:
+            logger.warning("could not save session to %s: %s", self.path, error)
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            with self._lock:
+                data, self._pending = self._pending, None
+                generation = self._generation
+            if data is not None:
+                with self._write_lock:
+                    if generation == self._generation:
+                        self._write(data)
+            if self._stop.is_set():
+                return
+            # Throttle: later snapshots wait, and only the newest of them is written
+            self._stop.wait(self.interval)
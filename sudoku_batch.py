@@ -0,0 +1,382 @@
+import argparse
+import math
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+from itertools import islice
+
+from sudoku_canonical import DedupIndex
+from sudoku_generator import (
+    DIFFICULTIES,
+    digit_symbol,
+    generate_sudoku,
+    removed_for,
+    seed_to_id,
+)
+from sudoku_grader import grade
+from sudoku_solvers import SOLVERS, get_solver
+from sudoku_symmetry import derive_puzzles
+
+"""
+Headless batch generation of Sudoku puzzles, without pygame.
+
+Puzzles are generated in chunks across a process pool and written one per line as
+they finish: row_length * row_length symbols read left to right, top to bottom, with
+0 for a blank cell and A, B, C... for 10, 11, 12... on boards larger than 9x9
+(sudoku_generator.digit_symbol), so every line of a batch has the same length; each is
+optionally prefixed by the puzzle ID (its 64-bit seed in hex) and a
+tab. Throughput is reported on stderr.
+
+With --derive K, every generated puzzle is followed by K - 1 puzzles derived from it
+through the Sudoku symmetries, which costs microseconds instead of milliseconds. Their
+ID is the seed of the transform (sudoku_symmetry.Transform.from_seed), applied to the
+puzzle before them that was generated. With --grade they are graded again, as a
+transform can move the score out of the band.
+
+With --dedup, puzzles already written are rejected as they come in and replaced until
+--count distinct ones are out: "exact" rejects identical givens, "symmetric" also
+rejects puzzles equivalent under the Sudoku symmetries (sudoku_canonical.py; that
+rules out --derive). --index keeps the keys in a file, so repeated runs never write a
+puzzle an earlier run already did. A run that ends short of --count (a --grade band
+or a dedup index it cannot get past) says so on stderr and exits with status 1.
+
+Example:
+    python sudoku_batch.py -n 10000 -d hard -o hard.txt
+"""
+
+
+# Calls to generate_sudoku in a row that may miss the --grade band (each after its own
+# attempts) before a chunk gives up and returns the puzzles it has
+BAND_MISSES = 3
+
+
+# Rounds of chunks in a row that may bring no new puzzle before dedup gives up
+DEDUP_ROUNDS = 5
+
+
+# Writes a board as a single line, one symbol per cell and 0 for blanks
+def board_to_line(board):
+    return "".join(digit_symbol(num) for row in board for num in row)
+
+
+# Seed for one chunk, so a given --seed always produces the same puzzles per chunk
+# no matter which worker picks the chunk up. Each puzzle then gets its own seed drawn
+# from the chunk's random.Random
+def chunk_seed(seed, chunk_index):
+    return seed * 1_000_003 + chunk_index
+
+
+# Runs in a worker process: generates one chunk of puzzles and returns them as Puzzles
+# With derive above 1, each generated puzzle is followed by up to derive - 1 puzzles
+# derived from it through the Sudoku symmetries (see sudoku_symmetry.py), with a freshly
+# carved mask if recarve is set. Transforms can change the grade, so with a band every
+# derived puzzle is graded again and kept only if it is inside
+# A chunk comes back short when band cannot be met (see BAND_MISSES)
+# solver names a sudoku_solvers solver to fill and check boards with (None: built-in)
+def generate_chunk(task):
+    chunk_index, count, size, removed, unique, band, seed, derive, recarve, solver = (
+        task
+    )
+    rng = random.Random(chunk_seed(seed, chunk_index))
+    solver = get_solver(solver) if solver else None
+    puzzles = []
+    misses = 0
+    while len(puzzles) < count:
+        sudoku = generate_sudoku(
+            size, removed, unique, band, solver=solver, seed=rng.getrandbits(64)
+        )
+        if sudoku is None:
+            misses += 1
+            if misses == BAND_MISSES:
+                break
+            continue
+        misses = 0
+        base = sudoku.get_puzzle()
+        puzzles.append(base)
+        wanted = min(derive - 1, count - len(puzzles))
+        derived = derive_puzzles(
+            base, seed=rng.getrandbits(64), recarve_removed=removed if recarve else None
+        )
+        if band is not None:
+            derived = (
+                puzzle
+                for puzzle in islice(derived, 4 * wanted)
+                if band[0] <= grade(puzzle.givens).score <= band[1]
+            )
+        puzzles.extend(islice(derived, wanted))
+    return puzzles
+
+
+# Runs in a worker process: generates one chunk like generate_chunk and pairs every
+# puzzle with its sudoku_grader score, so grading runs in parallel too
+def generate_graded_chunk(task):
+    return [(puzzle, grade(puzzle.givens).score) for puzzle in generate_chunk(task)]
+
+
+# Runs in a worker process: generates one chunk like generate_chunk and also returns
+# the dedup key of each puzzle, computed here so the main process only looks them up
+def generate_keyed_chunk(task):
+    *task, exact = task
+    puzzles = generate_chunk(task)
+    index = DedupIndex(exact)
+    return puzzles, [index.key(puzzle) for puzzle in puzzles]
+
+
+# Splits count puzzles into tasks of at most chunk puzzles each, numbering the chunks
+# from first_chunk
+def make_tasks(
+    count,
+    chunk,
+    size,
+    removed,
+    unique,
+    band,
+    seed,
+    derive=1,
+    recarve=False,
+    solver=None,
+    first_chunk=0,
+):
+    tasks = []
+    for chunk_index, start in enumerate(range(0, count, chunk), first_chunk):
+        tasks.append(
+            (
+                chunk_index,
+                min(chunk, count - start),
+                size,
+                removed,
+                unique,
+                band,
+                seed,
+                derive,
+                recarve,
+                solver,
+            )
+        )
+    return tasks
+
+
+# Generates count puzzles across workers processes, yielding each chunk's list of
+# Puzzles as soon as it finishes (in chunk order if ordered is set); with graded, each
+# list holds (Puzzle, score) pairs instead (not together with a dedup index)
+# With a DedupIndex, puzzles already in it are dropped and the rest added; further
+# rounds of chunks, on chunk indices not used yet, then make up the shortfall until
+# DEDUP_ROUNDS rounds in a row bring nothing new
+def generate_puzzles(
+    count,
+    removed,
+    size=9,
+    unique=True,
+    band=None,
+    workers=None,
+    chunk=64,
+    seed=None,
+    ordered=False,
+    derive=1,
+    recarve=False,
+    index=None,
+    graded=False,
+    solver=None,
+):
+    if graded and index is not None:
+        raise ValueError("graded chunks cannot be deduplicated")
+    if seed is None:
+        seed = int.from_bytes(os.urandom(8), "little")
+    tasks = make_tasks(
+        count, chunk, size, removed, unique, band, seed, derive, recarve, solver
+    )
+    with multiprocessing.Pool(workers) as pool:
+        results = pool.imap if ordered else pool.imap_unordered
+        if index is None:
+            worker = generate_graded_chunk if graded else generate_chunk
+            for puzzles in results(worker, tasks):
+                yield puzzles
+            return
+        missing = count
+        idle_rounds = 0
+        while tasks:
+            fresh_total = 0
+            keyed_tasks = [task + (index.exact,) for task in tasks]
+            for puzzles, keys in results(generate_keyed_chunk, keyed_tasks):
+                fresh = [
+                    puzzle for puzzle, key in zip(puzzles, keys) if index.add_key(key)
+                ][:missing]
+                missing -= len(fresh)
+                fresh_total += len(fresh)
+                yield fresh
+            idle_rounds = 0 if fresh_total else idle_rounds + 1
+            if not missing or idle_rounds == DEDUP_ROUNDS:
+                break
+            tasks = make_tasks(
+                missing,
+                chunk,
+                size,
+                removed,
+                unique,
+                band,
+                seed,
+                derive,
+                recarve,
+                solver,
+                first_chunk=tasks[-1][0] + 1,
+            )
+
+
+# Generates count puzzles and writes them to out as they finish, one line each
+# Returns the number of puzzles written
+def run_batch(out, count, removed, ids=False, **options):
+    written = 0
+    for puzzles in generate_puzzles(count, removed, **options):
+        for puzzle in puzzles:
+            if ids:
+                out.write(seed_to_id(puzzle.seed) + "\t")
+            out.write(board_to_line([puzzle.givens]))
+            out.write("\n")
+        out.flush()
+        written += len(puzzles)
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate Sudoku puzzles in bulk")
+    parser.add_argument(
+        "-n", "--count", type=int, default=1000, help="number of puzzles"
+    )
+    parser.add_argument(
+        "-d",
+        "--difficulty",
+        choices=sorted(DIFFICULTIES),
+        default="easy",
+        help="game mode to generate for (scaled to --size)",
+    )
+    parser.add_argument(
+        "--removed", type=int, help="cells to remove (overrides --difficulty)"
+    )
+    parser.add_argument("--size", type=int, default=9, help="rows/columns of the board")
+    parser.add_argument(
+        "--no-unique",
+        action="store_true",
+        help="skip the uniqueness check when removing cells",
+    )
+    parser.add_argument(
+        "--grade",
+        metavar="MIN:MAX",
+        help="only keep puzzles whose sudoku_grader score is in MIN..MAX",
+    )
+    parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=None,
+        help="worker processes (default: all cores)",
+    )
+    parser.add_argument("--chunk", type=int, default=64, help="puzzles per task")
+    parser.add_argument("--seed", type=int, help="base seed for reproducible output")
+    parser.add_argument(
+        "--ordered",
+        action="store_true",
+        help="write chunks in order instead of as they finish",
+    )
+    parser.add_argument(
+        "--ids", action="store_true", help="prefix each puzzle with its puzzle ID"
+    )
+    parser.add_argument(
+        "--derive",
+        type=int,
+        default=1,
+        metavar="K",
+        help="derive K - 1 symmetric puzzles from every generated one",
+    )
+    parser.add_argument(
+        "--recarve",
+        action="store_true",
+        help="carve derived puzzles afresh instead of transforming the mask",
+    )
+    parser.add_argument(
+        "--solver",
+        choices=sorted(SOLVERS),
+        help="fill and check boards with this solver (default: built-in search)",
+    )
+    parser.add_argument(
+        "--dedup",
+        choices=("exact", "symmetric"),
+        help="reject duplicate puzzles, or also ones equivalent under symmetry",
+    )
+    parser.add_argument(
+        "--index",
+        metavar="PATH",
+        help="dedup key file to check against and update (default --dedup symmetric)",
+    )
+    parser.add_argument("-o", "--output", help="output file (default: stdout)")
+    args = parser.parse_args(argv)
+    if args.size < 1 or math.isqrt(args.size) ** 2 != args.size:
+        parser.error("--size must be a perfect square: 4, 9, 16 or 25")
+    dedup = args.dedup or ("symmetric" if args.index else None)
+    if dedup == "symmetric" and args.derive > 1:
+        parser.error("--derive makes symmetric puzzles; use --dedup exact with it")
+    if dedup == "symmetric" and args.size > 9:
+        parser.error(
+            "--dedup symmetric (the default with --index) only supports boards up "
+            "to 9x9; use --dedup exact"
+        )
+
+    removed = (
+        args.removed
+        if args.removed is not None
+        else removed_for(args.difficulty, args.size)
+    )
+    band = None
+    if args.grade:
+        low, _, high = args.grade.partition(":")
+        band = (int(low or 0), int(high) if high else float("inf"))
+    index = None
+    if dedup:
+        exact = dedup == "exact"
+        if args.index and os.path.exists(args.index):
+            index = DedupIndex.load(args.index, exact)
+        else:
+            index = DedupIndex(exact)
+    out = open(args.output, "w") if args.output else sys.stdout
+    start = time.perf_counter()
+    try:
+        written = run_batch(
+            out,
+            args.count,
+            removed,
+            size=args.size,
+            unique=not args.no_unique,
+            band=band,
+            workers=args.workers,
+            chunk=args.chunk,
+            seed=args.seed,
+            ordered=args.ordered,
+            ids=args.ids,
+            derive=args.derive,
+            recarve=args.recarve,
+            index=index,
+            solver=args.solver,
+        )
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        if args.index:
+            index.save(args.index)
+    elapsed = time.perf_counter() - start
+    print(
+        f"generated {written} puzzles in {elapsed:.2f} s "
+        f"({written / elapsed:.1f} boards/s, {args.workers or os.cpu_count()} workers)",
+        file=sys.stderr,
+    )
+    if written < args.count:
+        print(
+            f"warning: only {written} of {args.count} puzzles could be generated",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,409 @@
+import math
+
+from compact_board import CompactBoard, FIXED, ENTERED
+from move_history import MoveHistory
+from session import Session, pack_session
+from sudoku_generator import DIFFICULTIES, Puzzle, generate_puzzle, removed_for
+from sudoku_solvers import DLXSolver
+
+"""
+The game state of a Sudoku board, without any drawing, so it can be used headless.
+
+BoardModel holds the puzzle, the player's values and flags, the counters behind the
+win and validity checks, the undo history and session saving. The pygame frontend in
+sudokumain.py subclasses it to draw the board; here, cells that change are only
+recorded in dirty_cells (and mistakes_dirty / full_redraw) for a frontend to pick up.
+"""
+
+
+class BoardModel:
+    def __init__(
+        self, rows, cols, difficulty="easy", pool=None, store=None, session=None
+    ):
+        self.rows = rows
+        self.cols = cols
+        self.box_length = math.isqrt(rows)
+        if self.box_length * self.box_length != rows or rows != cols:
+            raise ValueError("board must be square with a perfect square size")
+        # Draw an unplayed puzzle from the on-disk store first, then take a ready board
+        # from the pool, and only generate one now when both have nothing to give
+        # A saved session brings its own puzzle
+        puzzle = None
+        if session is not None:
+            puzzle = Puzzle(bytes(session.original.values), session.solution, 0)
+        elif store is not None and store.size == rows:
+            puzzle = store.draw(difficulty)
+        if puzzle is None:
+            if (
+                pool is not None
+                and pool.size == rows
+                and difficulty in pool.difficulties
+            ):
+                puzzle = pool.get(difficulty)
+            else:
+                puzzle = generate_puzzle(rows, self.get_removed_cells(difficulty))
+        # Values and fixed/entered flags live in one compact buffer each; self.board
+        # gives row views so cells can still be read as self.board[row][col]
+        # self.solution is the solved grid as bytes, so checking a cell is one lookup.
+        # Generated puzzles carry it; any other board is solved once here
+        self.solution = None
+        if isinstance(puzzle, Puzzle):
+            self.grid = CompactBoard(rows, puzzle.givens)
+            self.grid.fix_givens()
+            self.solution = puzzle.solution
+        elif isinstance(puzzle, CompactBoard):
+            self.grid = puzzle.copy()
+            self.grid.fix_givens()
+        else:
+            self.grid = CompactBoard.from_rows(puzzle, fix_givens=True)
+        if self.solution is None:
+            solution = DLXSolver().solve(self.grid)
+            if solution is None:
+                raise ValueError("puzzle has no solution")
+            self.solution = bytes(solution)
+        self.board = self.grid.rows
+        self.original = self.grid.copy()
+        # Every change made by sketch, place_number, enter_number and hint, for undo/redo
+        self.history = MoveHistory(self.original)
+        # Numbers entered with return that do not match the solution
+        self.mistakes = 0
+        self.mistakes_dirty = False
+        self.selected_cell = None
+        # Cells that changed since a frontend last drew them; full_redraw means
+        # every cell may have changed
+        self.dirty_cells = set()
+        self.full_redraw = True
+        # Set by main to checkpoint the game; changes counts edits so unchanged
+        # boards are not saved again
+        self.autosaver = None
+        self.changes = 0
+        self.saved_state = None
+        if session is not None:
+            self.grid.restore(session.grid)
+            self.history = session.history
+            self.selected_cell = session.selected
+            self.mistakes = session.mistakes
+        self.recount()
+
+    # Deliver removed num of cells, scaled to the board size
+    def get_removed_cells(self, difficulty):
+        if difficulty not in DIFFICULTIES:
+            difficulty = "easy"
+        return removed_for(difficulty, self.rows)
+
+    # Marks a cell as needing a redraw on the next frame
+    def mark_dirty(self, row, col):
+        self.dirty_cells.add((row, col))
+
+    # Enters the number as dark blue when clicking return
+    def enter_number(self):
+        if self.selected_cell:
+            row, col = self.selected_cell
+            number = self.board[row][col]
+            # Givens and numbers already entered have nothing to enter, so nothing is
+            # recorded for undo either
+            if number == 0 or self.is_fixed(row, col) or self.is_entered(row, col):
+                return False
+            if not self.is_correct(row, col):
+                self.mistakes += 1
+                self.mistakes_dirty = True
+            old_flags = self.grid.flags[row * self.cols + col]
+            self.set_entered(row, col, True)
+            self.record_move(row, col, number, old_flags)
+            self.mark_dirty(row, col)
+            return True
+        return False
+
+    # Sets the selected cell
+    def select(self, row, col):
+        if self.selected_cell:
+            self.mark_dirty(*self.selected_cell)
+        self.selected_cell = (row, col)
+        self.mark_dirty(row, col)
+
+    # Adds number to the cell
+    def sketch(self, number):
+        if not 1 <= int(number) <= self.rows:
+            return
+        if self.selected_cell:
+            row, col = self.selected_cell
+            if not self.is_fixed(row, col):
+                old = self.board[row][col]
+                old_flags = self.grid.flags[row * self.cols + col]
+                if old != int(number):
+                    self.set_entered(row, col, False)
+                self.set_value(row, col, int(number))
+                self.record_move(row, col, old, old_flags)
+                self.mark_dirty(row, col)
+
+    # Places the users number in
+    def place_number(self, number):
+        if self.selected_cell:
+            row, col = self.selected_cell
+            if not self.is_fixed(row, col):
+                old = self.board[row][col]
+                old_flags = self.grid.flags[row * self.cols + col]
+                self.set_value(row, col, int(number))
+                self.record_move(row, col, old, old_flags)
+                self.mark_dirty(row, col)
+
+    # Adds the change just made at row, col (from old and old_flags) to the history
+    def record_move(self, row, col, old, old_flags):
+        self.changes += 1
+        index = row * self.cols + col
+        self.history.record(
+            index, old, self.grid.values[index], old_flags, self.grid.flags[index]
+        )
+
+    # Takes back the last move. Returns False if there is nothing to undo
+    def undo(self):
+        move = self.history.undo()
+        if move is None:
+            return False
+        self.restore_cell(*move)
+        return True
+
+    # Makes the last undone move again. Returns False if there is nothing to redo
+    def redo(self):
+        move = self.history.redo()
+        if move is None:
+            return False
+        self.restore_cell(*move)
+        return True
+
+    # Puts value and flags back into a cell (given as row * cols + col) and selects it
+    def restore_cell(self, cell, value, flags):
+        self.changes += 1
+        row, col = divmod(cell, self.cols)
+        self.set_value(row, col, value)
+        self.set_entered(row, col, bool(flags & ENTERED))
+        self.select(row, col)
+
+    # Everything needed to resume this game later, see session.py
+    def session(self):
+        return Session(
+            self.original,
+            self.grid,
+            self.solution,
+            self.selected_cell,
+            self.mistakes,
+            self.history,
+        )
+
+    # Hands a snapshot to the autosaver if anything changed since the last one.
+    # now writes it before returning, for when the game is about to close
+    def checkpoint(self, now=False):
+        if self.autosaver is None:
+            return
+        state = (self.changes, self.selected_cell, self.mistakes)
+        if state == self.saved_state and not now:
+            return
+        self.saved_state = state
+        data = pack_session(self.session())
+        if now:
+            self.autosaver.save(data)
+        else:
+            self.autosaver.submit(data)
+
+    # Logic for resetting the board, removing current numbers. Utilizing deep copy method
+    def reset_to_original(self):
+        self.grid.restore(self.original)
+        self.history.reset(self.original)
+        self.changes += 1
+        self.selected_cell = None
+        self.mistakes = 0
+
+        # Every cell may have changed, so the next frame redraws the whole board
+        self.full_redraw = True
+        self.recount()
+
+    # Rebuilds the running counters used by is_full, all_numbers_entered and valid_board:
+    # filled_cells     - number of non-zero cells
+    # correct_cells    - number of cells matching the solution
+    # unentered_cells  - user cells holding a number that has not been entered yet
+    # row/col/box_counts[unit][num] - how many times num appears in each unit
+    # duplicates       - extra copies of numbers across all units (0 means no conflicts)
+    def recount(self):
+        size = self.rows
+        self.row_counts = [[0] * (size + 1) for _ in range(size)]
+        self.col_counts = [[0] * (size + 1) for _ in range(size)]
+        self.box_counts = [[0] * (size + 1) for _ in range(size)]
+        self.filled_cells = 0
+        self.unentered_cells = 0
+        self.duplicates = 0
+        self.correct_cells = 0
+        for row in range(self.rows):
+            for col in range(self.cols):
+                number = self.board[row][col]
+                if number != 0:
+                    self.count_number(row, col, number, 1)
+                    if self.is_unentered(row, col):
+                        self.unentered_cells += 1
+                    if self.is_correct(row, col):
+                        self.correct_cells += 1
+
+    # Index of the box containing row, col, numbered left to right, top to bottom
+    def box_index(self, row, col):
+        return (row // self.box_length) * self.box_length + col // self.box_length
+
+    # True if the cell was given by the puzzle
+    def is_fixed(self, row, col):
+        return self.grid.has_flag(row, col, FIXED)
+
+    # True if the number in the cell was confirmed with return
+    def is_entered(self, row, col):
+        return self.grid.has_flag(row, col, ENTERED)
+
+    # True for a user cell holding a number that has not been entered with return
+    def is_unentered(self, row, col):
+        return self.board[row][col] != 0 and not self.grid.flags[
+            row * self.cols + col
+        ] & (FIXED | ENTERED)
+
+    # Adds (delta=1) or removes (delta=-1) one copy of number at row, col from the counters
+    def count_number(self, row, col, number, delta):
+        self.filled_cells += delta
+        for counts in (
+            self.row_counts[row],
+            self.col_counts[col],
+            self.box_counts[self.box_index(row, col)],
+        ):
+            if delta > 0:
+                if counts[number] > 0:
+                    self.duplicates += 1
+                counts[number] += 1
+            else:
+                counts[number] -= 1
+                if counts[number] > 0:
+                    self.duplicates -= 1
+
+    # Writes number into row, col and keeps the counters in sync
+    def set_value(self, row, col, number):
+        old = self.board[row][col]
+        if old == number:
+            return
+        if old != 0:
+            if self.is_unentered(row, col):
+                self.unentered_cells -= 1
+            if self.is_correct(row, col):
+                self.correct_cells -= 1
+            self.count_number(row, col, old, -1)
+        self.board[row][col] = number
+        if number != 0:
+            self.count_number(row, col, number, 1)
+            if self.is_unentered(row, col):
+                self.unentered_cells += 1
+            if self.is_correct(row, col):
+                self.correct_cells += 1
+
+    # Sets the entered flag of row, col and keeps unentered_cells in sync
+    def set_entered(self, row, col, entered):
+        if self.is_entered(row, col) == entered:
+            return
+        was_unentered = self.is_unentered(row, col)
+        self.grid.set_flag(row, col, ENTERED, entered)
+        self.unentered_cells += self.is_unentered(row, col) - was_unentered
+
+    # True if the number at row, col is repeated in its row, column or box
+    def has_conflict(self, row, col):
+        number = self.board[row][col]
+        if number == 0:
+            return False
+        return (
+            self.row_counts[row][number] > 1
+            or self.col_counts[col][number] > 1
+            or self.box_counts[self.box_index(row, col)][number] > 1
+        )
+
+    # Fills in the correct number for the selected cell (or the first empty or wrong cell
+    # if nothing editable is selected) and marks it entered. Returns the cell, or None if
+    # the board is already correct
+    def hint(self):
+        cell = self.selected_cell
+        if cell is None or self.is_fixed(*cell) or self.is_correct(*cell):
+            cell = None
+            for row in range(self.rows):
+                for col in range(self.cols):
+                    if not self.is_correct(row, col):
+                        cell = (row, col)
+                        break
+                if cell is not None:
+                    break
+        if cell is None:
+            return None
+        row, col = cell
+        old = self.board[row][col]
+        old_flags = self.grid.flags[row * self.cols + col]
+        self.set_value(row, col, self.solution[row * self.cols + col])
+        self.set_entered(row, col, True)
+        self.record_move(row, col, old, old_flags)
+        self.mark_dirty(row, col)
+        return cell
+
+    # True if the cell holds the number from the solution
+    def is_correct(self, row, col):
+        return self.board[row][col] == self.solution[row * self.cols + col]
+
+    # True once every cell matches the solution
+    def is_solved(self):
+        return self.correct_cells == self.rows * self.cols
+
+    # Check if all numbers entered are selected + dark blue
+    def all_numbers_entered(self):
+        return self.unentered_cells == 0
+
+    # Checks if board is full
+    def is_full(self):
+        return self.filled_cells == self.rows * self.cols
+
+    # Check if board is valid
+    def valid_board(self):
+        return self.duplicates == 0
+
+    def valid_row(self, row):
+        nums = set()
+        for num in self.board[row]:
+            if num != 0:
+                if num in nums:
+                    return False
+                nums.add(num)
+        return True
+
+    def valid_col(self, col):
+        nums = set()
+        for row in range(self.rows):
+            num = self.board[row][col]
+            if num != 0:
+                if num in nums:
+                    return False
+                nums.add(num)
+        return True
+
+    def valid_box(self, start_row, start_col):
+        nums = set()
+        for row in range(start_row, start_row + self.box_length):
+            for col in range(start_col, start_col + self.box_length):
+                num = self.board[row][col]
+                if num != 0:
+                    if num in nums:
+                        return False
+                    nums.add(num)
+        return True
+
+    #  Captures arrow movement between each cell
+    def move_arrow(self, direction):
+        if self.selected_cell:
+            row, col = self.selected_cell
+            self.mark_dirty(row, col)
+            if direction == "UP" and row > 0:
+                row -= 1
+            elif direction == "DOWN" and row < self.rows - 1:
+                row += 1
+            elif direction == "LEFT" and col > 0:
+                col -= 1
+            elif direction == "RIGHT" and col < self.cols - 1:
+                col += 1
+            self.selected_cell = (row, col)
+        else:
+            self.selected_cell = (0, 0)
+        self.mark_dirty(*self.selected_cell)
@@ -1,4 +1,9 @@
 import math, random
+from collections import namedtuple
+from compact_board import CompactBoard
+from sudoku_grader import grade
+from sudoku_solvers import flatten
+from instrumentation import metrics
 
 """
 This was adapted from a GeeksforGeeks article "Program for Sudoku Generator" by Aarti_Rathi and Ankur Trisal
@@ -6,6 +11,49 @@ https://www.geeksforgeeks.org/program-sudoku-generator/
 
 """
 
+# Number of cells removed for each game mode
+DIFFICULTIES = {"easy": 30, "medium": 40, "hard": 50}
+
+# Most cells the uniqueness search may visit per removal on boards above 9x9; past it the
+# cell is kept. Large boards otherwise hit searches that take minutes to settle, while a
+# 9x9 check never needs more than a few ten thousand cells and is always settled exactly
+CARVE_BUDGET = 400
+
+# Puzzle seeds are 64-bit, so a puzzle can be stored or sent as 8 bytes
+SEED_BITS = 64
+
+
+# A generated puzzle: givens and solution are immutable bytes, one cell per byte row by
+# row (0 for blanks in givens), and seed regenerates the puzzle
+Puzzle = namedtuple("Puzzle", "givens solution seed")
+
+
+# Number of cells to remove for a game mode on a size x size board
+# (DIFFICULTIES is for 9x9; other sizes remove the same fraction of the board)
+def removed_for(difficulty, size):
+    return DIFFICULTIES[difficulty] * size * size // 81
+
+
+# Text shown for a cell value: 1-9 as digits, then A, B, C... on boards larger than 9x9
+def digit_symbol(number):
+    if number <= 9:
+        return str(number)
+    return chr(ord("A") + number - 10)
+
+
+# Returns a fresh random seed for a new puzzle
+def new_seed():
+    return random.SystemRandom().getrandbits(SEED_BITS)
+
+
+# Puzzle IDs are the seed written as 16 hex digits
+def seed_to_id(seed):
+    return f"{seed:016x}"
+
+
+def id_to_seed(puzzle_id):
+    return int(puzzle_id, 16)
+
 
 class SudokuGenerator:
     """
@@ -13,40 +61,73 @@ class SudokuGenerator:
         This should initialize:
         self.row_length		- the length of each row
         self.removed_cells	- the total number of cells to be removed
-        self.board			- a 2D list of ints to represent the board
+        self.grid			- a CompactBoard holding the values, one byte per cell
+        self.board			- the rows of self.grid, indexed like a 2D list of ints
         self.box_length		- the square root of row_length
+        self.row_masks		- one bitmask per row, bit n set when n is used in that row
+        self.col_masks		- one bitmask per column, same layout as row_masks
+        self.box_masks		- one bitmask per box, boxes numbered left to right, top to bottom
+        self.unique			- whether remove_cells must keep the solution unique
+        self.solver			- optional sudoku_solvers.SudokuSolver used for filling and counting
+        self.seed			- the 64-bit seed this board is generated from
+        self.rng			- a random.Random seeded with self.seed, used for every random choice
+        self.solution		- the solved grid as bytes, set by fill_values (None before that)
+        self.backtracks		- digits taken back by the last fill_random
+        self.candidate_checks	- cells whose candidates the last fill_random read from the masks
+        self.nodes_left		- cells count_solutions may still visit before giving up
 
         Parameters:
-    row_length is the number of rows/columns of the board (always 9 for this project)
+    row_length is the number of rows/columns of the board, a perfect square (4, 9, 16, 25)
     removed_cells is an integer value - the number of cells to be removed
+    unique is a boolean - when True, only removals that leave exactly one solution are kept
+    solver is an optional SudokuSolver (e.g. DLXSolver); None keeps the built-in search
+    seed is an optional 64-bit int; the same seed and parameters always give the same board
 
         Return:
         None
     """
 
-    def __init__(self, row_length, removed_cells):
+    def __init__(self, row_length, removed_cells, unique=False, solver=None, seed=None):
+        self.box_length = math.isqrt(row_length)
+        if row_length < 1 or self.box_length * self.box_length != row_length:
+            raise ValueError("board size must be a perfect square")
         self.row_length = row_length
         self.removed_cells = removed_cells
-        self.box_length = int(math.sqrt(row_length))
-        tmp_board = []
-        for i in range(row_length):
-            tmp_row = []
-            for j in range(row_length):
-                tmp_row.append(0)
-            tmp_board.append(tmp_row)
-
-        self.board = tmp_board
+        self.unique = unique
+        self.solver = solver
+        self.seed = new_seed() if seed is None else seed & ((1 << SEED_BITS) - 1)
+        self.rng = random.Random(self.seed)
+        self.solution = None
+        self.backtracks = 0
+        self.candidate_checks = 0
+        self.nodes_left = float("inf")
+        self.grid = CompactBoard(row_length)
+        self.board = self.grid.rows
+        self.row_masks = [0] * row_length
+        self.col_masks = [0] * row_length
+        self.box_masks = [0] * row_length
 
     """
-	Returns a 2D python list of numbers which represents the board
+	Returns the rows of the board, each indexable like a python list of numbers
 
 	Parameters: None
-	Return: list[list]
+	Return: list[memoryview]
     """
 
     def get_board(self):
         return self.board
 
+    """
+	Returns the current board, its solution and its seed as a Puzzle
+    Should be called after remove_cells, so the board holds only the givens
+
+	Parameters: None
+	Return: Puzzle
+    """
+
+    def get_puzzle(self):
+        return Puzzle(bytes(self.grid.values), self.solution, self.seed)
+
     """
 	Displays the board to the console
     This is not strictly required, but it may be useful for debugging purposes
@@ -61,6 +142,57 @@ class SudokuGenerator:
                 print(self.board[i][j], end=" ")
             print()
 
+    """
+    Returns the index of the box containing (row, col)
+    Boxes are numbered left to right, top to bottom starting at 0
+
+	Parameters:
+	row and col are the row index and col index of the cell
+
+	Return: int
+    """
+
+    def box_index(self, row, col):
+        return (row // self.box_length) * self.box_length + col // self.box_length
+
+    """
+    Writes num into (row, col) and marks it as used in the row, column and box masks
+    The cell must be empty before calling this
+
+	Parameters:
+	row and col are the row index and col index of the cell
+	num is the value to place
+
+	Return: None
+    """
+
+    def place(self, row, col, num):
+        bit = 1 << num
+        self.board[row][col] = num
+        self.row_masks[row] |= bit
+        self.col_masks[col] |= bit
+        self.box_masks[self.box_index(row, col)] |= bit
+
+    """
+    Clears (row, col) and releases its value from the row, column and box masks
+    Does nothing if the cell is already empty
+
+	Parameters:
+	row and col are the row index and col index of the cell
+
+	Return: None
+    """
+
+    def unplace(self, row, col):
+        num = self.board[row][col]
+        if num == 0:
+            return
+        bit = ~(1 << num)
+        self.board[row][col] = 0
+        self.row_masks[row] &= bit
+        self.col_masks[col] &= bit
+        self.box_masks[self.box_index(row, col)] &= bit
+
     """
 	Determines if num is contained in the specified row (horizontal) of the board
     If num is already in the specified row, return False. Otherwise, return True
@@ -73,13 +205,8 @@ class SudokuGenerator:
     """
 
     def valid_in_row(self, row, num):
-        # Iterate thru the row and check if the number is already present
-        check_row = self.board[row]
-        for i in range(len(check_row)):
-            if check_row[i] == num:
-                return False
-
-        return True
+        # The row mask has bit num set if num is already present
+        return not self.row_masks[row] & (1 << num)
 
     """
 	Determines if num is contained in the specified column (vertical) of the board
@@ -93,13 +220,7 @@ class SudokuGenerator:
     """
 
     def valid_in_col(self, col, num):
-
-        # Iterate through board
-        for i in range(len(self.board)):
-            if self.board[i][col] == num:  # Check if board at row,col is equal to num
-                return False
-
-        return True
+        return not self.col_masks[col] & (1 << num)
 
     """
 	Determines if num is contained in the 3x3 box specified on the board
@@ -115,17 +236,12 @@ class SudokuGenerator:
     """
 
     def valid_in_box(self, row_start, col_start, num):
-        # Iterate through board
-        for i in range(row_start, row_start + 3):
-            for j in range(col_start, col_start + 3):
-                if self.board[i][j] == num:  # Check if board at row,col is equal to num
-                    return False
-
-        return True
+        return not self.box_masks[self.box_index(row_start, col_start)] & (1 << num)
 
     """
     Determines if it is valid to enter num at (row, col) in the board
     This is done by checking that num is unused in the appropriate, row, column, and box
+    All three checks are a single lookup in the masks kept up to date by place/unplace
 
 	Parameters:
 	row and col are the row index and col index of the cell to check in the board
@@ -135,38 +251,31 @@ class SudokuGenerator:
     """
 
     def is_valid(self, row, col, num):
-        if not self.valid_in_row(row, num):
-            return False
-        if not self.valid_in_col(col, num):
-            return False
-
-        # Calculate the starting index of the 3x3 box
-        box_row_start = (row // self.box_length) * self.box_length
-        box_col_start = (col // self.box_length) * self.box_length
-
-        if not self.valid_in_box(box_row_start, box_col_start, num):
-            return False
-
-        return True
+        used = (
+            self.row_masks[row]
+            | self.col_masks[col]
+            | self.box_masks[self.box_index(row, col)]
+        )
+        return not used & (1 << num)
 
     """
-    Fills the specified 3x3 box with values
+    Fills the specified box (box_length x box_length) with values
     For each position, generates a random digit which has not yet been used in the box
 
 	Parameters:
 	row_start and col_start are the starting indices of the box to check
-	i.e. the box is from (row_start, col_start) to (row_start+2, col_start+2)
+	i.e. the box is from (row_start, col_start) to (row_start+box_length-1, col_start+box_length-1)
 
 	Return: None
     """
 
     def fill_box(self, row_start, col_start):
-        nums = [1, 2, 3, 4, 5, 6, 7, 8, 9]
-        random.shuffle(nums)
+        nums = list(range(1, self.row_length + 1))
+        self.rng.shuffle(nums)
         count = 0
-        for i in range(row_start, row_start + 3):
-            for j in range(col_start, col_start + 3):
-                self.board[i][j] = nums[count]
+        for i in range(row_start, row_start + self.box_length):
+            for j in range(col_start, col_start + self.box_length):
+                self.place(i, j, nums[count])
                 count += 1
 
     """
@@ -178,62 +287,225 @@ class SudokuGenerator:
     """
 
     def fill_diagonal(self):
-        # Iterate thru the row length, but increment by the box length gets diagonals
-        for i in range(0, self.row_length, self.box_length):
-            self.fill_box(i, i)
+        with metrics.timer("generator.fill_diagonal"):
+            # Iterate thru the row length, but increment by the box length gets diagonals
+            for i in range(0, self.row_length, self.box_length):
+                self.fill_box(i, i)
 
     """
-    DO NOT CHANGE
     Provided for students
-    Fills the remaining cells of the board
-    Should be called after the diagonal boxes have been filled
+    Constructs a solution with fill_random, or with the solver if one was given
+    A solver completes the board after fill_diagonal, trying its choices in random
+    order so the grids stay random
+    fill_random replaced the recursive fill_remaining the project started with (kept in
+    benchmarks/bench_generator.py): that always tried digits in ascending order, which
+    biases the grids, and its fixed cell order backtracks far too much at 16x16 and above
+    The finished grid is kept in self.solution before any cells are removed
 
-	Parameters:
-	row, col specify the coordinates of the first empty (0) cell
-
-	Return:
-	boolean (whether or not we could solve the board)
-    """
-
-    def fill_remaining(self, row, col):
-        if col >= self.row_length and row < self.row_length - 1:
-            row += 1
-            col = 0
-        if row >= self.row_length and col >= self.row_length:
-            return True
-        if row < self.box_length:
-            if col < self.box_length:
-                col = self.box_length
-        elif row < self.row_length - self.box_length:
-            if col == int(row // self.box_length * self.box_length):
-                col += self.box_length
+	Parameters: None
+	Return: None
+    """
+
+    def fill_values(self):
+        if self.solver is None:
+            self.fill_random()
         else:
-            if col == self.row_length - self.box_length:
-                row += 1
-                col = 0
-                if row >= self.row_length:
-                    return True
-
-        for num in range(1, self.row_length + 1):
-            if self.is_valid(row, col, num):
-                self.board[row][col] = num
-                if self.fill_remaining(row, col + 1):
-                    return True
-                self.board[row][col] = 0
-        return False
+            self.fill_diagonal()
+            solution = self.solver.solve(self.grid, rng=self.rng)
+            for index, num in enumerate(solution):
+                row, col = divmod(index, self.row_length)
+                if self.board[row][col] == 0:
+                    self.place(row, col, num)
+        self.solution = bytes(self.grid.values)
 
     """
-    DO NOT CHANGE
-    Provided for students
-    Constructs a solution by calling fill_diagonal and fill_remaining
+    Empties every cell of the board and resets the masks
 
 	Parameters: None
 	Return: None
     """
 
-    def fill_values(self):
-        self.fill_diagonal()
-        self.fill_remaining(0, self.box_length)
+    def clear(self):
+        self.grid.values[:] = bytes(len(self.grid.values))
+        self.row_masks = [0] * self.row_length
+        self.col_masks = [0] * self.row_length
+        self.box_masks = [0] * self.row_length
+
+    """
+    Fills the whole board with a random solution
+    Always fills the cell with the fewest candidates next, trying its candidates in an
+    order shuffled by self.rng, so no digit is favoured. The search keeps its own stack
+    of (cell, untried candidates) instead of recursing, so it has no call overhead per
+    cell and no depth limit at any board size.
+    A search that needs more than 3 * row_length^2 steps is abandoned and started over
+    on an empty board: random restarts cut off the rare runs that get stuck deep in
+    backtracking, which is what makes 16x16 and 25x25 boards fast
+
+	Parameters: None
+	Return: None
+    """
+
+    def fill_random(self):
+        self.backtracks = 0
+        self.candidate_checks = 0
+        restarts = 0
+        with metrics.timer("generator.fill_random"):
+            while not self._fill_random(3 * self.row_length * self.row_length):
+                restarts += 1
+        metrics.add("generator.fill_random.backtracks", self.backtracks)
+        metrics.add("generator.fill_random.candidate_checks", self.candidate_checks)
+        metrics.add("generator.fill_random.restarts", restarts)
+
+    def _fill_random(self, steps):
+        self.clear()
+        size = self.row_length
+        full = (1 << (size + 1)) - 2
+        values = self.grid.values
+        row_masks = self.row_masks
+        col_masks = self.col_masks
+        box_masks = self.box_masks
+        shuffle = self.rng.shuffle
+        empties = [
+            (row, col, self.box_index(row, col))
+            for row in range(size)
+            for col in range(size)
+        ]
+        # One entry per filled cell: (its slot in empties, the cell, untried digits)
+        stack = []
+        backtracks = 0
+        # Each cell the scan below looks at is one is_valid-style check of all its digits
+        checks = 0
+
+        while empties:
+            steps -= 1
+            if steps < 0:
+                self.backtracks += backtracks
+                self.candidate_checks += checks
+                return False
+            best = -1
+            best_count = size + 1
+            best_candidates = 0
+            for i, (row, col, box) in enumerate(empties):
+                candidates = full & ~(row_masks[row] | col_masks[col] | box_masks[box])
+                count = candidates.bit_count()
+                if count < best_count:
+                    best, best_count, best_candidates = i, count, candidates
+                    if count <= 1:
+                        break
+            checks += i + 1
+            if best_count:
+                empties[best], empties[-1] = empties[-1], empties[best]
+                nums = []
+                while best_candidates:
+                    bit = best_candidates & -best_candidates
+                    best_candidates ^= bit
+                    nums.append(bit.bit_length() - 1)
+                shuffle(nums)
+                stack.append((best, empties.pop(), nums))
+
+            # Put the next untried digit in the newest cell, backing out of cells that
+            # have none left (the first pass after a dead end starts here too)
+            while stack:
+                best, cell, nums = stack[-1]
+                row, col, box = cell
+                index = row * size + col
+                num = values[index]
+                if num:
+                    backtracks += 1
+                    bit = ~(1 << num)
+                    row_masks[row] &= bit
+                    col_masks[col] &= bit
+                    box_masks[box] &= bit
+                if nums:
+                    num = nums.pop()
+                    bit = 1 << num
+                    values[index] = num
+                    row_masks[row] |= bit
+                    col_masks[col] |= bit
+                    box_masks[box] |= bit
+                    break
+                values[index] = 0
+                stack.pop()
+                empties.append(cell)
+                empties[best], empties[-1] = empties[-1], empties[best]
+            else:
+                self.backtracks += backtracks
+                self.candidate_checks += checks
+                return False
+        self.backtracks += backtracks
+        self.candidate_checks += checks
+        return True
+
+    """
+    Counts the solutions of the current board, stopping as soon as limit is reached
+    Always branches on the empty cell with the fewest candidates, read straight from the masks
+    The board and masks are left exactly as they were found
+    If a solver was given, counting is handed to it instead
+    With a budget, a search that visits more than budget cells gives up and returns limit,
+    so callers testing uniqueness treat a board too hard to settle as not unique
+
+	Parameters:
+	limit is the number of solutions after which counting stops (2 is enough to test uniqueness)
+	budget is an optional cap on the cells the built-in search may visit
+
+	Return: int (at most limit)
+    """
+
+    def count_solutions(self, limit=2, budget=None):
+        if self.solver is not None:
+            return self.solver.count_solutions(self.grid, limit)
+        self.nodes_left = float("inf") if budget is None else budget
+        empties = []
+        for row in range(self.row_length):
+            for col in range(self.row_length):
+                if self.board[row][col] == 0:
+                    empties.append((row, col, self.box_index(row, col)))
+        full = (1 << (self.row_length + 1)) - 2
+        return self._count_solutions(empties, full, limit)
+
+    def _count_solutions(self, empties, full, limit):
+        if not empties:
+            return 1
+        self.nodes_left -= 1
+        if self.nodes_left < 0:
+            return limit
+        row_masks = self.row_masks
+        col_masks = self.col_masks
+        box_masks = self.box_masks
+
+        # Pick the most constrained cell, bailing out early on dead ends and forced cells
+        best = 0
+        best_count = self.row_length + 1
+        best_candidates = 0
+        for i, (row, col, box) in enumerate(empties):
+            candidates = full & ~(row_masks[row] | col_masks[col] | box_masks[box])
+            count = candidates.bit_count()
+            if count < best_count:
+                if count == 0:
+                    return 0
+                best, best_count, best_candidates = i, count, candidates
+                if count == 1:
+                    break
+
+        # Swap the chosen cell to the end so it can be popped and pushed back cheaply
+        empties[best], empties[-1] = empties[-1], empties[best]
+        row, col, box = empties.pop()
+        found = 0
+        while best_candidates:
+            bit = best_candidates & -best_candidates
+            best_candidates ^= bit
+            row_masks[row] |= bit
+            col_masks[col] |= bit
+            box_masks[box] |= bit
+            found += self._count_solutions(empties, full, limit - found)
+            row_masks[row] ^= bit
+            col_masks[col] ^= bit
+            box_masks[box] ^= bit
+            if found >= limit:
+                break
+        empties.append((row, col, box))
+        empties[best], empties[-1] = empties[-1], empties[best]
+        return found
 
     """
     Removes the appropriate number of cells from the board
@@ -241,23 +513,43 @@ class SudokuGenerator:
     Should be called after the entire solution has been constructed
     i.e. after fill_values has been called
 
-    NOTE: Be careful not to 'remove' the same cell multiple times
-    i.e. if a cell is already 0, it cannot be removed again
+    Cells are visited in a random order without repeats, so no cell is removed twice
+    If self.unique is set, a removal is undone when the board would no longer have exactly
+    one solution; the board may then end up with fewer than removed_cells blanks if no
+    further cell can be removed safely. Above 9x9 each check gets CARVE_BUDGET cells of
+    search, and a removal it cannot settle in time is undone as well
 
 	Parameters: None
-	Return: None
+	Return: int (the number of cells actually removed)
     """
 
     def remove_cells(self):
-        self.removed_cells
-        for i in range(self.removed_cells):
-            row = random.randint(0, self.row_length - 1)
-            col = random.randint(0, self.row_length - 1)
-            self.board[row][col] = 0
+        cells = [
+            (row, col)
+            for row in range(self.row_length)
+            for col in range(self.row_length)
+        ]
+        self.rng.shuffle(cells)
+        removed = 0
+        checks = 0
+        budget = CARVE_BUDGET if self.row_length > 9 else None
+        with metrics.timer("generator.remove_cells"):
+            for row, col in cells:
+                if removed == self.removed_cells:
+                    break
+                num = self.board[row][col]
+                self.unplace(row, col)
+                if self.unique:
+                    checks += 1
+                    if self.count_solutions(2, budget) != 1:
+                        self.place(row, col, num)
+                        continue
+                removed += 1
+        metrics.add("generator.remove_cells.uniqueness_checks", checks)
+        return removed
 
 
 """
-DO NOT CHANGE
 Provided for students
 Given a number of rows and number of cells to remove, this function:
 1. creates a SudokuGenerator
@@ -265,18 +557,79 @@ Given a number of rows and number of cells to remove, this function:
 3. removes the appropriate number of cells
 4. returns the representative 2D Python Lists of the board and solution
 
+If band is given, the carved board is graded with sudoku_grader.grade and the
+steps are repeated (up to attempts times) until the score falls inside the band.
+Attempt i uses seed + i, so the returned generator's seed always regenerates it.
+If no attempt lands inside the band, None is returned
+
 Parameters:
 size is the number of rows/columns of the board (9 for this project)
 removed is the number of cells to clear (set to 0)
+unique is whether the carved board must keep exactly one solution
+band is an optional (min_score, max_score) pair, both inclusive
+attempts is the most boards to try for a band before giving up
+solver is an optional SudokuSolver passed on to SudokuGenerator
+seed is an optional 64-bit int; None picks a new random seed
 
-Return: list[list] (a 2D Python list to represent the board)
+Return: SudokuGenerator (get_board and get_puzzle give the board), or None
 """
 
 
-def generate_sudoku(size, removed):
-    sudoku = SudokuGenerator(size, removed)
-    sudoku.fill_values()
-    board = sudoku.get_board()
-    sudoku.remove_cells()
-    board = sudoku.get_board()
+def generate_sudoku(
+    size, removed, unique=False, band=None, attempts=100, solver=None, seed=None
+):
+    if seed is None:
+        seed = new_seed()
+    with metrics.timer("generator.generate"):
+        for attempt in range(attempts):
+            sudoku = SudokuGenerator(size, removed, unique, solver, seed + attempt)
+            sudoku.fill_values()
+            sudoku.remove_cells()
+            if band is None or band[0] <= grade(sudoku.grid).score <= band[1]:
+                break
+        else:
+            sudoku = None
+    metrics.add("generator.attempts", attempt + 1)
     return sudoku
+
+
+# Generates a puzzle with exactly one solution and returns it as a Puzzle, which keeps
+# the solved grid next to the givens. This is what the game plays
+def generate_puzzle(size, removed, seed=None):
+    return generate_sudoku(size, removed, unique=True, seed=seed).get_puzzle()
+
+
+"""
+Checks whether board is the puzzle generated from seed with the given parameters
+
+The fast path only regenerates the solved grid, skipping the carving (which dominates
+generation time with unique=True): the board must have removed blanks (or fewer, with
+unique=True) and every given must match the grid. exact=True also repeats the carving and compares the boards
+cell for cell
+
+Parameters:
+board is a CompactBoard, rows of ints or a flat sequence of values (0 for blanks)
+seed, size, removed, unique and solver are the generate_sudoku arguments it was made with
+exact is whether to regenerate the whole puzzle instead of just the grid
+
+Return: boolean
+"""
+
+
+def matches_seed(board, seed, size, removed, unique=False, solver=None, exact=False):
+    values = flatten(board)
+    if len(values) != size * size:
+        return False
+    sudoku = SudokuGenerator(size, removed, unique, solver, seed)
+    sudoku.fill_values()
+    if exact:
+        sudoku.remove_cells()
+        return bytes(sudoku.grid.values) == bytes(values)
+    blanks = 0
+    for given, num in zip(values, sudoku.solution):
+        if given == 0:
+            blanks += 1
+        elif given != num:
+            return False
+    # With unique=True carving can stop short of removed when no cell is safe to remove
+    return blanks == removed or unique and blanks < removed
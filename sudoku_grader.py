@@ -0,0 +1,283 @@
+import math
+from collections import namedtuple
+
+from sudoku_solvers import flatten
+
+"""
+Grades a puzzle by solving it the way a person would.
+
+The solver only uses logical techniques, always falling back to the cheapest one
+that makes progress: naked and hidden singles, locked candidates (pointing and
+claiming), naked and hidden pairs, and X-wing. Every time a technique makes
+progress its weight is added to the score, so a puzzle that needs many pairs or an
+X-wing scores far higher than one that falls to singles. A puzzle that cannot be
+finished with these techniques is marked unsolved and gets UNSOLVED_PENALTY added.
+
+Candidates are kept as bitmasks (bit n set when n is still possible) on a flat list
+of cells, with the unit tables for each board size built once and cached.
+"""
+
+# Techniques in the order they are tried, with the weight added to the score each use
+TECHNIQUES = (
+    ("naked_single", 1),
+    ("hidden_single", 2),
+    ("locked_candidates", 10),
+    ("naked_pair", 20),
+    ("hidden_pair", 30),
+    ("x_wing", 50),
+)
+WEIGHTS = dict(TECHNIQUES)
+UNSOLVED_PENALTY = 1000
+
+# score: total difficulty, solved: whether logic alone finished the puzzle,
+# hardest: name of the hardest technique needed (None if nothing was needed),
+# counts: how many times each technique made progress
+Grade = namedtuple("Grade", "score solved hardest counts")
+
+_tables = {}
+
+
+# Unit and peer tables for a size x size board, built once per size
+class _Tables:
+    def __init__(self, size):
+        box_length = math.isqrt(size)
+        self.size = size
+        self.rows = [[row * size + col for col in range(size)] for row in range(size)]
+        self.cols = [[row * size + col for row in range(size)] for col in range(size)]
+        self.boxes = []
+        for box in range(size):
+            row_start = (box // box_length) * box_length
+            col_start = (box % box_length) * box_length
+            self.boxes.append(
+                [
+                    row * size + col
+                    for row in range(row_start, row_start + box_length)
+                    for col in range(col_start, col_start + box_length)
+                ]
+            )
+        self.units = self.rows + self.cols + self.boxes
+        self.peers = []
+        for cell in range(size * size):
+            row, col = divmod(cell, size)
+            box = (row // box_length) * box_length + col // box_length
+            peers = set(self.rows[row]) | set(self.cols[col]) | set(self.boxes[box])
+            peers.discard(cell)
+            self.peers.append(tuple(peers))
+        # Each box/line intersection as (intersection, rest of box, rest of line)
+        self.intersections = []
+        for box_cells in self.boxes:
+            box_set = set(box_cells)
+            for line in self.rows + self.cols:
+                common = [cell for cell in line if cell in box_set]
+                if common:
+                    self.intersections.append(
+                        (
+                            common,
+                            [cell for cell in box_cells if cell not in common],
+                            [cell for cell in line if cell not in common],
+                        )
+                    )
+
+
+def _get_tables(size):
+    tables = _tables.get(size)
+    if tables is None:
+        tables = _tables[size] = _Tables(size)
+    return tables
+
+
+class _Solver:
+    def __init__(self, values):
+        size = math.isqrt(len(values))
+        self.tables = _get_tables(size)
+        self.values = values
+        full = (1 << (size + 1)) - 2
+        self.cands = [0 if num else full for num in values]
+        self.empty = sum(1 for num in values if not num)
+        self.broken = False
+        for cell, num in enumerate(values):
+            if num:
+                bit = ~(1 << num)
+                for peer in self.tables.peers[cell]:
+                    self.cands[peer] &= bit
+
+    def place(self, cell, bit):
+        cands = self.cands
+        self.values[cell] = bit.bit_length() - 1
+        cands[cell] = 0
+        self.empty -= 1
+        mask = ~bit
+        for peer in self.tables.peers[cell]:
+            cands[peer] &= mask
+
+    # Removes bits from every cell in cells, returns True if anything changed
+    def eliminate(self, cells, bits):
+        cands = self.cands
+        changed = False
+        for cell in cells:
+            if cands[cell] & bits:
+                cands[cell] &= ~bits
+                changed = True
+        return changed
+
+    # Each technique returns how many times it made progress (0 when it found nothing)
+
+    def naked_single(self):
+        cands = self.cands
+        placed = 0
+        for cell, mask in enumerate(cands):
+            if mask and not mask & (mask - 1):
+                self.place(cell, mask)
+                placed += 1
+            elif mask == 0 and not self.values[cell]:
+                self.broken = True
+                return 0
+        return placed
+
+    def hidden_single(self):
+        cands = self.cands
+        for unit in self.tables.units:
+            once = twice = 0
+            for cell in unit:
+                mask = cands[cell]
+                twice |= once & mask
+                once |= mask
+            hidden = once & ~twice
+            if hidden:
+                placed = 0
+                while hidden:
+                    bit = hidden & -hidden
+                    hidden ^= bit
+                    for cell in unit:
+                        if cands[cell] & bit:
+                            self.place(cell, bit)
+                            placed += 1
+                            break
+                return placed
+        return 0
+
+    def locked_candidates(self):
+        cands = self.cands
+        for common, box_rest, line_rest in self.tables.intersections:
+            inside = 0
+            for cell in common:
+                inside |= cands[cell]
+            if not inside:
+                continue
+            rest_of_box = 0
+            for cell in box_rest:
+                rest_of_box |= cands[cell]
+            rest_of_line = 0
+            for cell in line_rest:
+                rest_of_line |= cands[cell]
+            # Pointing: only this line can hold the digit in the box
+            pointing = inside & ~rest_of_box & rest_of_line
+            if pointing and self.eliminate(line_rest, pointing):
+                return True
+            # Claiming: only this box can hold the digit in the line
+            claiming = inside & ~rest_of_line & rest_of_box
+            if claiming and self.eliminate(box_rest, claiming):
+                return True
+        return False
+
+    def naked_pair(self):
+        cands = self.cands
+        for unit in self.tables.units:
+            seen = {}
+            for cell in unit:
+                mask = cands[cell]
+                if mask and mask.bit_count() == 2:
+                    if mask in seen:
+                        other = seen[mask]
+                        rest = [c for c in unit if c != cell and c != other]
+                        if self.eliminate(rest, mask):
+                            return True
+                    else:
+                        seen[mask] = cell
+        return False
+
+    def hidden_pair(self):
+        cands = self.cands
+        size = self.tables.size
+        for unit in self.tables.units:
+            # For each digit, the cells of the unit (as a tuple) that can still hold it
+            places = {}
+            for num in range(1, size + 1):
+                bit = 1 << num
+                cells = tuple(cell for cell in unit if cands[cell] & bit)
+                if len(cells) == 2:
+                    places.setdefault(cells, []).append(bit)
+            for cells, bits in places.items():
+                if len(bits) == 2:
+                    pair = bits[0] | bits[1]
+                    changed = False
+                    for cell in cells:
+                        if cands[cell] & ~pair:
+                            cands[cell] &= pair
+                            changed = True
+                    if changed:
+                        return True
+        return False
+
+    def x_wing(self):
+        cands = self.cands
+        tables = self.tables
+        size = tables.size
+        for lines, crosses in ((tables.rows, tables.cols), (tables.cols, tables.rows)):
+            for num in range(1, size + 1):
+                bit = 1 << num
+                seen = {}
+                for index, line in enumerate(lines):
+                    spots = tuple(i for i, cell in enumerate(line) if cands[cell] & bit)
+                    if len(spots) != 2:
+                        continue
+                    if spots in seen:
+                        first = seen[spots]
+                        changed = False
+                        for spot in spots:
+                            rest = [
+                                cell
+                                for i, cell in enumerate(crosses[spot])
+                                if i != first and i != index
+                            ]
+                            changed |= self.eliminate(rest, bit)
+                        if changed:
+                            return True
+                    else:
+                        seen[spots] = index
+        return False
+
+
+# Grades a puzzle (CompactBoard, rows of ints or flat sequence, 0 for blanks)
+# Returns a Grade; the input board is not modified
+def grade(board):
+    return _grade(_Solver(flatten(board)))
+
+
+# Grades a puzzle and also returns the grid the techniques reached (0 where they got stuck)
+def solve_logically(board):
+    solver = _Solver(flatten(board))
+    return _grade(solver), solver.values
+
+
+def _grade(solver):
+    steps = [(name, getattr(solver, name)) for name, _ in TECHNIQUES]
+    counts = {name: 0 for name, _ in TECHNIQUES}
+    score = 0
+    hardest = None
+    hardest_rank = -1
+    while solver.empty and not solver.broken:
+        for rank, (name, step) in enumerate(steps):
+            progress = step()
+            if progress:
+                counts[name] += progress
+                score += WEIGHTS[name] * progress
+                if rank > hardest_rank:
+                    hardest, hardest_rank = name, rank
+                break
+        else:
+            break
+    solved = solver.empty == 0 and not solver.broken
+    if not solved:
+        score += UNSOLVED_PENALTY
+    return Grade(score, solved, hardest, counts)
@@ -0,0 +1,273 @@
+import math
+
+"""
+Pluggable Sudoku solvers.
+
+Every solver takes a flat sequence of cell values (row by row, 0 for blanks) and
+implements solve_all(values, limit, rng), returning up to limit solutions as flat
+lists. solve and count_solutions are built on top of it, so any solver can be used
+for hints, uniqueness checks or, given an rng to shuffle its choices, for filling
+a random grid.
+
+BacktrackingSolver is the generator's original recursive fill (fill_remaining, now
+in benchmarks/bench_generator.py): cells in fixed order, digits tried from 1
+upwards. DLXSolver treats the puzzle as an exact cover problem and runs Knuth's
+Algorithm X on dancing links, always branching on the constraint with the fewest
+remaining options, which keeps its worst case far below the fixed-order search on
+adversarial puzzles.
+"""
+
+
+# Accepts a CompactBoard, rows of ints, or a flat sequence and returns a flat list
+def flatten(board):
+    values = getattr(board, "values", None)
+    if values is not None:
+        return list(values)
+    board = list(board)
+    if board and not isinstance(board[0], int):
+        return [num for row in board for num in row]
+    return board
+
+
+class SudokuSolver:
+    # Returns up to limit solutions of values as flat lists
+    # rng, if given, is a random.Random used to shuffle the order choices are tried in
+    def solve_all(self, values, limit=1, rng=None):
+        raise NotImplementedError
+
+    # Returns one solution as a flat list, or None if the puzzle has none
+    def solve(self, board, rng=None):
+        solutions = self.solve_all(flatten(board), 1, rng)
+        return solutions[0] if solutions else None
+
+    # Counts solutions, stopping at limit (2 is enough to test uniqueness)
+    def count_solutions(self, board, limit=2):
+        return len(self.solve_all(flatten(board), limit))
+
+
+class BacktrackingSolver(SudokuSolver):
+    def solve_all(self, values, limit=1, rng=None):
+        values = list(values)
+        size = math.isqrt(len(values))
+        box_length = math.isqrt(size)
+        row_masks = [0] * size
+        col_masks = [0] * size
+        box_masks = [0] * size
+        empties = []
+        for cell, num in enumerate(values):
+            row, col = divmod(cell, size)
+            box = (row // box_length) * box_length + col // box_length
+            if num:
+                bit = 1 << num
+                if (row_masks[row] | col_masks[col] | box_masks[box]) & bit:
+                    return []
+                row_masks[row] |= bit
+                col_masks[col] |= bit
+                box_masks[box] |= bit
+            else:
+                empties.append((cell, row, col, box))
+        digits = list(range(1, size + 1))
+        solutions = []
+
+        def search(index):
+            if index == len(empties):
+                solutions.append(list(values))
+                return
+            cell, row, col, box = empties[index]
+            used = row_masks[row] | col_masks[col] | box_masks[box]
+            order = digits
+            if rng is not None:
+                order = digits[:]
+                rng.shuffle(order)
+            for num in order:
+                bit = 1 << num
+                if used & bit:
+                    continue
+                values[cell] = num
+                row_masks[row] |= bit
+                col_masks[col] |= bit
+                box_masks[box] |= bit
+                search(index + 1)
+                row_masks[row] ^= bit
+                col_masks[col] ^= bit
+                box_masks[box] ^= bit
+                values[cell] = 0
+                if len(solutions) >= limit:
+                    return
+
+        search(0)
+        return solutions
+
+
+class DLXSolver(SudokuSolver):
+    def solve_all(self, values, limit=1, rng=None):
+        values = list(values)
+        size = math.isqrt(len(values))
+        box_length = math.isqrt(size)
+        cells = size * size
+
+        # Constraint ids: cell filled, digit in row, digit in column, digit in box.
+        # Constraints already met by the givens are left out of the matrix entirely
+        satisfied = set()
+        for cell, num in enumerate(values):
+            if num:
+                row, col = divmod(cell, size)
+                box = (row // box_length) * box_length + col // box_length
+                for constraint in (
+                    cell,
+                    cells + row * size + num - 1,
+                    2 * cells + col * size + num - 1,
+                    3 * cells + box * size + num - 1,
+                ):
+                    if constraint in satisfied:
+                        return []
+                    satisfied.add(constraint)
+
+        # Node 0 is the root; column headers follow, then one node per 1 in the matrix
+        left = [0]
+        right = [0]
+        up = [0]
+        down = [0]
+        column = [0]
+        count = [0]
+        header = {}
+        option = [None]
+
+        def add_header(constraint):
+            node = len(left)
+            header[constraint] = node
+            left.append(left[0])
+            right.append(0)
+            right[left[0]] = node
+            left[0] = node
+            up.append(node)
+            down.append(node)
+            column.append(node)
+            count.append(0)
+            option.append(None)
+            return node
+
+        for cell in range(cells):
+            if values[cell]:
+                continue
+            row, col = divmod(cell, size)
+            box = (row // box_length) * box_length + col // box_length
+            for num in range(1, size + 1):
+                constraints = (
+                    cell,
+                    cells + row * size + num - 1,
+                    2 * cells + col * size + num - 1,
+                    3 * cells + box * size + num - 1,
+                )
+                if any(constraint in satisfied for constraint in constraints):
+                    continue
+                first = None
+                for constraint in constraints:
+                    col_node = header.get(constraint)
+                    if col_node is None:
+                        col_node = add_header(constraint)
+                    node = len(left)
+                    column.append(col_node)
+                    count.append(0)
+                    option.append((cell, num))
+                    up.append(up[col_node])
+                    down.append(col_node)
+                    down[up[col_node]] = node
+                    up[col_node] = node
+                    count[col_node] += 1
+                    if first is None:
+                        first = node
+                        left.append(node)
+                        right.append(node)
+                    else:
+                        left.append(left[first])
+                        right.append(first)
+                        right[left[first]] = node
+                        left[first] = node
+
+        # A constraint that is neither met by the givens nor covered by any option
+        # (an empty cell with no candidates, say) can never be met
+        if len(header) + len(satisfied) < 4 * cells:
+            return []
+
+        def cover(col_node):
+            right[left[col_node]] = right[col_node]
+            left[right[col_node]] = left[col_node]
+            i = down[col_node]
+            while i != col_node:
+                j = right[i]
+                while j != i:
+                    down[up[j]] = down[j]
+                    up[down[j]] = up[j]
+                    count[column[j]] -= 1
+                    j = right[j]
+                i = down[i]
+
+        def uncover(col_node):
+            i = up[col_node]
+            while i != col_node:
+                j = left[i]
+                while j != i:
+                    count[column[j]] += 1
+                    down[up[j]] = j
+                    up[down[j]] = j
+                    j = left[j]
+                i = up[i]
+            right[left[col_node]] = col_node
+            left[right[col_node]] = col_node
+
+        solutions = []
+        chosen = []
+
+        def search():
+            if right[0] == 0:
+                solution = list(values)
+                for cell, num in chosen:
+                    solution[cell] = num
+                solutions.append(solution)
+                return
+            # Branch on the constraint with the fewest options left
+            col_node = right[0]
+            best = col_node
+            best_count = count[col_node]
+            while col_node != 0 and best_count > 1:
+                if count[col_node] < best_count:
+                    best, best_count = col_node, count[col_node]
+                col_node = right[col_node]
+            if best_count == 0:
+                return
+            cover(best)
+            rows = []
+            i = down[best]
+            while i != best:
+                rows.append(i)
+                i = down[i]
+            if rng is not None:
+                rng.shuffle(rows)
+            for i in rows:
+                chosen.append(option[i])
+                j = right[i]
+                while j != i:
+                    cover(column[j])
+                    j = right[j]
+                search()
+                j = left[i]
+                while j != i:
+                    uncover(column[j])
+                    j = left[j]
+                chosen.pop()
+                if len(solutions) >= limit:
+                    break
+            uncover(best)
+
+        search()
+        return solutions
+
+
+# Solver classes keyed by the name the --solver options of sudoku_batch.py and
+# puzzle_store.py take
+SOLVERS = {"backtracking": BacktrackingSolver, "dlx": DLXSolver}
+
+
+def get_solver(name="dlx"):
+    return SOLVERS[name]()
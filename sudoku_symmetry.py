@@ -0,0 +1,129 @@
+import math
+import operator
+import random
+
+from sudoku_generator import Puzzle, SudokuGenerator
+
+"""
+Deriving new puzzles from one generated puzzle through the Sudoku symmetries.
+
+Relabelling the digits, permuting rows within a band (and columns within a stack),
+permuting the bands (and stacks) and transposing all turn a valid grid into another
+valid grid, and a puzzle with one solution into another puzzle with one solution.
+For 9x9 that is 9! * 6^8 * 2 (about 1.2 * 10^12) transforms. The sudoku_grader score
+is not kept: the grader scans cells in a fixed order, so the same puzzle moved around
+can take a different path and score a few points apart.
+
+A transform is a cell permutation plus a digit table, so applying one is a single
+pass over the cells and a bytes.translate: a few microseconds, against milliseconds
+for a fresh generate_sudoku.
+
+Example:
+    base = generate_sudoku(9, 50, unique=True).get_puzzle()
+    for puzzle in islice(derive_puzzles(base), 1000):
+        ...
+"""
+
+
+# Tail of every digit table: values past the board size are left as they are
+_UNUSED_LABELS = bytes(range(256))
+
+
+# Picks one ordering of items using index as a mixed-radix number; returns the ordering
+# and what is left of index for the next choice
+def _permutation(items, index):
+    items = list(items)
+    order = []
+    while items:
+        index, pick = divmod(index, len(items))
+        order.append(items.pop(pick))
+    return order, index
+
+
+class Transform:
+    # cells[i] is the index of the cell whose value lands in cell i; digits maps every
+    # value to its new label (a 256-byte table for bytes.translate, 0 stays 0)
+    def __init__(self, cells, digits):
+        self.cells = cells
+        self.digits = digits
+        self._gather = operator.itemgetter(*cells)
+
+    # Builds the transform numbered seed. The seed is read as a mixed-radix number whose
+    # digits pick the digit relabelling, band and row orders, stack and column orders and
+    # whether to transpose, so no random.Random has to be seeded per transform. A 64-bit
+    # seed reaches every 9x9 transform; larger boards use a subset of theirs
+    @classmethod
+    def from_seed(cls, size, seed):
+        box_length = math.isqrt(size)
+        labels, seed = _permutation(range(1, size + 1), seed)
+        lines = []
+        for _ in range(2):
+            groups, seed = _permutation(range(box_length), seed)
+            order = []
+            for group in groups:
+                start = group * box_length
+                inner, seed = _permutation(range(start, start + box_length), seed)
+                order += inner
+            lines.append(order)
+        rows, cols = lines
+        if seed & 1:
+            cells = [col * size + row for row in rows for col in cols]
+        else:
+            cells = [row * size + col for row in rows for col in cols]
+        digits = bytes([0] + labels) + _UNUSED_LABELS[size + 1 :]
+        return cls(cells, digits)
+
+    # A uniformly chosen transform drawn from rng
+    @classmethod
+    def random(cls, size, rng):
+        return cls.from_seed(size, rng.getrandbits(64))
+
+    # Applies the transform to a flat bytes-like board (givens or solution)
+    def apply(self, values):
+        return bytes(self._gather(values)).translate(self.digits)
+
+    def apply_puzzle(self, puzzle, seed):
+        return Puzzle(self.apply(puzzle.givens), self.apply(puzzle.solution), seed)
+
+
+# Carves a new puzzle with exactly one solution out of a solved grid
+def recarve(solution, size, removed, seed):
+    sudoku = SudokuGenerator(size, removed, unique=True, seed=seed)
+    for index, num in enumerate(solution):
+        row, col = divmod(index, size)
+        sudoku.place(row, col, num)
+    sudoku.solution = bytes(solution)
+    sudoku.remove_cells()
+    return sudoku.get_puzzle()
+
+
+# Yields puzzles derived from puzzle (a Puzzle with its solution), skipping any it has
+# already produced, until count have been yielded or forever if count is None.
+# Each derived puzzle's seed rebuilds its transform with Transform.from_seed. With
+# recarve, the derived grid gets a freshly carved mask of removed blanks instead of the
+# transformed one (slower: this runs the uniqueness checks again)
+def derive_puzzles(puzzle, count=None, seed=None, recarve_removed=None):
+    size = math.isqrt(len(puzzle.solution))
+    rng = random.Random(seed)
+    seen = {puzzle.givens}
+    produced = 0
+    misses = 0
+    while count is None or produced < count:
+        derived_seed = rng.getrandbits(64)
+        transform = Transform.from_seed(size, derived_seed)
+        if recarve_removed is None:
+            derived = transform.apply_puzzle(puzzle, derived_seed)
+        else:
+            derived = recarve(
+                transform.apply(puzzle.solution), size, recarve_removed, derived_seed
+            )
+        if derived.givens in seen:
+            # Tiny boards have few distinct transforms; stop rather than spin forever
+            misses += 1
+            if misses > 1000:
+                return
+            continue
+        misses = 0
+        seen.add(derived.givens)
+        produced += 1
+        yield derived
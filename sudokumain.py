@@ -2,9 +2,34 @@ import pygame
 import random
 import math
 import sys
-from sudoku_generator import SudokuGenerator
-
-pygame.init()
+import os
+import time
+import logging
+from sudoku_generator import DIFFICULTIES, digit_symbol, generate_puzzle, removed_for
+from sudoku_board import BoardModel
+from puzzle_pool import PuzzlePool
+from puzzle_store import PuzzleStore
+from session import Autosaver, load_session
+from instrumentation import metrics
+
+"""
+The pygame frontend. The game state lives in sudoku_board.BoardModel, which never
+imports pygame; Board here only adds drawing and mouse handling. pygame is not
+initialised on import: open_window starts just the display and font subsystems when
+the first window is created.
+"""
+
+
+# Opens (or resizes) the game window, starting the display and font subsystems the
+# first time it is called
+def open_window(size=(800, 800)):
+    if not pygame.display.get_init():
+        pygame.display.init()
+    if not pygame.font.get_init():
+        pygame.font.init()
+    screen = pygame.display.set_mode(size)
+    pygame.display.set_caption("Sudoku")
+    return screen
 
 
 # Function for drawing the button for opening menu screen
@@ -22,203 +47,303 @@ def create_surface(surface, text, font, color, center):
     surface.blit(text_surface, text_rect)
 
 
-# Function that delivers the opening menu screen visuals on game start
-def game_start(screen):
-    BLACK = (0, 0, 0)
+# Colour of a digit in each state: given by the puzzle, sketched, or entered with return
+DIGIT_COLORS = {
+    "fixed": (0, 0, 0),
+    "sketched": (30, 144, 255),  # Light blue
+    "entered": (0, 0, 139),  # Dark blue
+}
+
+
+# Keeps fonts, text and button surfaces so a frame only has to blit them
+class RenderCache:
+    def __init__(self):
+        self.fonts = {}
+        self.texts = {}
+        self.buttons = {}
+
+    # Returns the default font at size, loading it the first time it is asked for
+    def font(self, size):
+        font = self.fonts.get(size)
+        if font is None:
+            if not pygame.font.get_init():
+                pygame.font.init()
+            font = self.fonts[size] = pygame.font.Font(None, size)
+        return font
+
+    # Returns the rendered surface for text, rendering it only once per size and colour
+    def text(self, text, size, color):
+        key = (text, size, color)
+        surface = self.texts.get(key)
+        if surface is None:
+            surface = self.texts[key] = self.font(size).render(text, True, color)
+        return surface
+
+    # Returns the glyph for a digit in one of the DIGIT_COLORS states
+    def digit(self, number, state, size=60):
+        return self.text(digit_symbol(number), size, DIGIT_COLORS[state])
+
+    # Returns a finished button (rounded rect plus centred label) the size of rect
+    def button(self, rect, color, text, text_color, font_size):
+        key = (rect.size, color, text, text_color, font_size)
+        surface = self.buttons.get(key)
+        if surface is None:
+            surface = pygame.Surface(rect.size, pygame.SRCALPHA)
+            local_rect = surface.get_rect()
+            pygame.draw.rect(surface, color, local_rect, border_radius=10)
+            label = self.text(text, font_size, text_color)
+            surface.blit(label, label.get_rect(center=local_rect.center))
+            self.buttons[key] = surface
+        return surface
+
+    # Pre-renders every digit glyph so the first frames do not pay for font rendering
+    def warm_digits(self, size=60, count=9):
+        for state in DIGIT_COLORS:
+            for number in range(1, count + 1):
+                self.digit(number, state, size)
+
+
+render_cache = RenderCache()
+
+
+# Folder this file lives in, so assets load no matter what the working directory is
+ASSET_DIR = os.path.dirname(os.path.abspath(__file__))
+# Default puzzle store, used when it has been built
+STORE_PATH = os.path.join(ASSET_DIR, "puzzles.sdk")
+# Where the game in progress is checkpointed, so it can be resumed after closing
+SESSION_PATH = os.path.join(ASSET_DIR, "session.sdks")
+
+
+# Opening menu screen. Everything on it is static, so the whole screen is composed
+# once onto a cached surface (image loaded, scaled and converted a single time) and
+# drawing it is one blit
+class StartScreen:
     WHITE = (255, 255, 255)
     BLUE = (30, 144, 255)
     DARK_BLUE = (0, 0, 139)
     BUTTON_COLOR = (255, 69, 0)
-    BUTTON_HOVER_COLOR = (255, 140, 0)
     WIDTH = 800
     HEIGHT = 800
     BUTTON_WIDTH = 150
     BUTTON_HEIGHT = 60
 
-    start_title_font = pygame.font.Font(None, 100)
-    game_mode_font = pygame.font.Font(None, 60)
-    button_font = pygame.font.Font(None, 40)
+    def __init__(self):
+        self.surface = None
+        self.button_rect_1 = pygame.Rect(
+            self.WIDTH // 4 - self.BUTTON_WIDTH // 2,
+            self.HEIGHT // 2,
+            self.BUTTON_WIDTH,
+            self.BUTTON_HEIGHT,
+        )
+        self.button_rect_2 = pygame.Rect(
+            self.WIDTH // 2 - self.BUTTON_WIDTH // 2,
+            self.HEIGHT // 2,
+            self.BUTTON_WIDTH,
+            self.BUTTON_HEIGHT,
+        )
+        self.button_rect_3 = pygame.Rect(
+            3 * self.WIDTH // 4 - self.BUTTON_WIDTH // 2,
+            self.HEIGHT // 2,
+            self.BUTTON_WIDTH,
+            self.BUTTON_HEIGHT,
+        )
 
-    screen.fill(WHITE)
+    # Composes the menu onto self.surface; only runs the first time the menu is drawn
+    def load(self, screen):
+        surface = pygame.Surface(screen.get_size())
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert()
+        surface.fill(self.WHITE)
 
-    create_surface(
-        screen,
-        "Welcome To Sudoku",
-        start_title_font,
-        DARK_BLUE,
-        (WIDTH // 2, HEIGHT // 3 - 150),
-    )
-    create_surface(
-        screen,
-        "Select Game Mode:",
-        game_mode_font,
-        BLUE,
-        (WIDTH // 2, HEIGHT // 2 - 100),
-    )
+        title = render_cache.text("Welcome To Sudoku", 100, self.DARK_BLUE)
+        surface.blit(
+            title, title.get_rect(center=(self.WIDTH // 2, self.HEIGHT // 3 - 150))
+        )
+        mode = render_cache.text("Select Game Mode:", 60, self.BLUE)
+        surface.blit(
+            mode, mode.get_rect(center=(self.WIDTH // 2, self.HEIGHT // 2 - 100))
+        )
 
-    button_rect_1 = pygame.Rect(
-        WIDTH // 4 - BUTTON_WIDTH // 2, HEIGHT // 2, BUTTON_WIDTH, BUTTON_HEIGHT
-    )
-    button_rect_2 = pygame.Rect(
-        WIDTH // 2 - BUTTON_WIDTH // 2, HEIGHT // 2, BUTTON_WIDTH, BUTTON_HEIGHT
-    )
-    button_rect_3 = pygame.Rect(
-        3 * WIDTH // 4 - BUTTON_WIDTH // 2, HEIGHT // 2, BUTTON_WIDTH, BUTTON_HEIGHT
-    )
+        for rect, label in (
+            (self.button_rect_1, "Easy"),
+            (self.button_rect_2, "Medium"),
+            (self.button_rect_3, "Hard"),
+        ):
+            surface.blit(
+                render_cache.button(rect, self.BUTTON_COLOR, label, self.WHITE, 40),
+                rect.topleft,
+            )
+
+        gator_img = pygame.image.load(os.path.join(ASSET_DIR, "8bit-gator.png"))
+        surface.blit(pygame.transform.scale(gator_img, (200, 200)), (300, 500))
+        self.surface = surface
+
+    # Draws the menu and returns the Easy, Medium and Hard button rects
+    def draw(self, screen):
+        if self.surface is None or self.surface.get_size() != screen.get_size():
+            self.load(screen)
+        screen.blit(self.surface, (0, 0))
+        return self.button_rect_1, self.button_rect_2, self.button_rect_3
 
-    draw_button(screen, BUTTON_COLOR, button_rect_1, "Easy", WHITE, button_font)
-    draw_button(screen, BUTTON_COLOR, button_rect_2, "Medium", WHITE, button_font)
-    draw_button(screen, BUTTON_COLOR, button_rect_3, "Hard", WHITE, button_font)
-    gator_img = pygame.image.load("8bit-gator.png")
-    scaled_img = pygame.transform.scale(gator_img, (200, 200))
-    screen.blit(scaled_img, (300, 500))
 
-    return button_rect_1, button_rect_2, button_rect_3
+start_screen = StartScreen()
 
 
-# Function that generates sudoku board from SudokuGenerator Class
-def generate_sudoku(size, removed):
-    sudoku = SudokuGenerator(size, removed)
-    sudoku.fill_values()
-    board = sudoku.get_board()
-    sudoku.remove_cells()
-    return board
+# Function that delivers the opening menu screen visuals on game start
+def game_start(screen):
+    return start_screen.draw(screen)
 
 
-# Class Board Constructor
-class Board:
-    def __init__(self, rows, cols, difficulty="easy"):
-        self.rows = rows
-        self.cols = cols
+# Class Board Constructor: the pygame view of a BoardModel
+class Board(BoardModel):
+    def __init__(
+        self, rows, cols, difficulty="easy", pool=None, store=None, session=None
+    ):
+        super().__init__(rows, cols, difficulty, pool, store, session)
+        # Any perfect square size works: cells, lines and glyphs scale to fit 600 px
         self.cell_size = 600 // rows
-        self.board = generate_sudoku(rows, self.get_removed_cells(difficulty))
-        self.fixed_board = [
-            [cell if cell != 0 else None for cell in row] for row in self.board
-        ]
-        self.board_backup = [row[:] for row in self.board]
-        self.fixed_board_backup = [row[:] for row in self.fixed_board]
-        self.selected_cell = None
+        self.grid_size = self.cell_size * rows
+        self.font_size = self.cell_size * 10 // 11
+        self.mistakes_rect = pygame.Rect(640, 260, 150, 40)
         self.buttons = {
             "reset": pygame.Rect(650, 50, 120, 50),
             "restart": pygame.Rect(650, 120, 120, 50),
             "exit": pygame.Rect(650, 190, 120, 50),
         }
-        self.entered_numbers = [[False for col in range(cols)] for row in range(rows)]
+        render_cache.warm_digits(self.font_size, rows)
+        # Grid and buttons never change, so they are drawn once onto a background layer.
+        # Cells that changed since the last frame are kept in dirty_cells; full_redraw
+        # asks for the whole screen to be redrawn instead
+        self.background = None
 
     # Draw buttons for the board
     def draw_buttons(self, screen):
-        button_font = pygame.font.Font(None, 35)
-
         button_color = (255, 69, 0)
         button_text_color = (255, 255, 255)
 
-        draw_button(
-            screen,
-            button_color,
-            self.buttons["reset"],
-            "Reset",
-            button_text_color,
-            button_font,
-        )
-        draw_button(
-            screen,
-            button_color,
-            self.buttons["restart"],
-            "Restart",
-            button_text_color,
-            button_font,
-        )
-        draw_button(
-            screen,
-            button_color,
-            self.buttons["exit"],
-            "Exit",
-            button_text_color,
-            button_font,
-        )
-
-    # Deliver removed num of cells
-    def get_removed_cells(self, difficulty):
-        if difficulty == "easy":
-            return 30
-        elif difficulty == "medium":
-            return 40
-        elif difficulty == "hard":
-            return 50
-        return 30
+        for name, label in (
+            ("reset", "Reset"),
+            ("restart", "Restart"),
+            ("exit", "Exit"),
+        ):
+            rect = self.buttons[name]
+            screen.blit(
+                render_cache.button(rect, button_color, label, button_text_color, 35),
+                rect.topleft,
+            )
 
-    # Draw the Sudoku board
-    def draw(self, screen):
+    # Draw the grid lines of the Sudoku board
+    def draw_grid(self, screen):
         for i in range(self.rows + 1):
-            line_width = 3 if i % 3 == 0 else 1
+            line_width = 3 if i % self.box_length == 0 else 1
             pygame.draw.line(
                 screen,
                 (0, 0, 0),
                 (0, i * self.cell_size),
-                (600, i * self.cell_size),
+                (self.grid_size, i * self.cell_size),
                 line_width,
             )
             pygame.draw.line(
                 screen,
                 (0, 0, 0),
                 (i * self.cell_size, 0),
-                (i * self.cell_size, 600),
+                (i * self.cell_size, self.grid_size),
                 line_width,
             )
 
+    # Builds the background layer: white fill, grid lines and buttons
+    def build_background(self, screen):
+        self.background = pygame.Surface(screen.get_size())
+        if pygame.display.get_surface() is not None:
+            self.background = self.background.convert()
+        self.background.fill((255, 255, 255))
+        self.draw_grid(self.background)
+        self.draw_buttons(self.background)
+
+    # Draws whatever is in the cell at row, col (number only, no background)
+    def draw_cell(self, screen, row, col):
+        number = self.board[row][col]
+        if number != 0:
+            self.draw_number(screen, number, row, col, self.is_fixed(row, col))
+
+    # Rectangle covered by the cell at row, col
+    def cell_rect(self, row, col):
+        return pygame.Rect(
+            col * self.cell_size, row * self.cell_size, self.cell_size, self.cell_size
+        )
+
+    # Draw the Sudoku board
+    def draw(self, screen):
+        if self.background is None or self.background.get_size() != screen.get_size():
+            self.build_background(screen)
+        screen.blit(self.background, (0, 0))
+
         for i in range(self.rows):
             for j in range(self.cols):
-                if self.board[i][j] != 0 or self.fixed_board[i][j] is not None:
-                    self.draw_number(
-                        screen,
-                        (
-                            self.board[i][j]
-                            if self.board[i][j] != 0
-                            else self.fixed_board[i][j]
-                        ),
-                        i,
-                        j,
-                        self.fixed_board[i][j] is not None,
-                    )
+                self.draw_cell(screen, i, j)
 
         if self.selected_cell:
             self.highlight_selected_cell(screen)
 
-        self.draw_buttons(screen)
+        self.draw_mistakes(screen)
+        self.dirty_cells.clear()
+        self.full_redraw = False
+
+    # Mistake counter shown under the buttons
+    def draw_mistakes(self, screen):
+        screen.blit(self.background, self.mistakes_rect, self.mistakes_rect)
+        if self.mistakes:
+            text = render_cache.text(f"Mistakes: {self.mistakes}", 35, (255, 69, 0))
+            screen.blit(text, text.get_rect(center=self.mistakes_rect.center))
+        self.mistakes_dirty = False
+
+    # Redraws only what changed since the last frame and returns the rectangles to update
+    def draw_dirty(self, screen):
+        if self.full_redraw or self.background is None:
+            self.draw(screen)
+            return [screen.get_rect()]
+
+        rects = []
+        for row, col in self.dirty_cells:
+            rect = self.cell_rect(row, col)
+            screen.blit(self.background, rect, rect)
+            self.draw_cell(screen, row, col)
+            if self.selected_cell == (row, col):
+                self.highlight_selected_cell(screen)
+            rects.append(rect)
+        self.dirty_cells.clear()
+        if self.mistakes_dirty:
+            self.draw_mistakes(screen)
+            rects.append(self.mistakes_rect)
+        return rects
 
     # Logic for handling in-game buttons - reset, restart, and exit
     def handle_button_click(self, pos, screen):
         if self.buttons["reset"].collidepoint(pos):
             self.reset_to_original(screen)
         elif self.buttons["restart"].collidepoint(pos):
+            self.checkpoint(now=True)
             self.restart_game(screen)
             return True
         elif self.buttons["exit"].collidepoint(pos):
+            self.checkpoint(now=True)
             pygame.quit()
             sys.exit()
 
     # Logic for accepting number input from user
     def draw_number(self, screen, number, row, col, fixed):
-        font = pygame.font.Font(None, 60)
         if fixed:
-            color = (0, 0, 0)
-        elif self.entered_numbers[row][col]:
-            color = (0, 0, 139)  # Dark blue
+            state = "fixed"
+        elif self.is_entered(row, col):
+            state = "entered"
         else:
-            color = (30, 144, 255)  # Light blue
-        text = font.render(str(number), True, color)
-        screen.blit(text, (col * self.cell_size + 20, row * self.cell_size + 10))
+            state = "sketched"
+        text = render_cache.digit(number, state, self.font_size)
+        screen.blit(text, text.get_rect(center=self.cell_rect(row, col).center))
 
-    # Enters the number as dark blue when clicking return
-    def enter_number(self, screen, row, col):
-        if self.selected_cell:
-            row, col = self.selected_cell
-            number = self.board[row][col]
-            if number == 0:
-                return False
-            self.entered_numbers[row][col] = True
-            return True
-        return False
+    # Logic for resetting the board, removing current numbers
+    def reset_to_original(self, screen):
+        super().reset_to_original()
 
     # Highlights the cell to create UI showing which cell the user is entering into
     def highlight_selected_cell(self, screen):
@@ -242,135 +367,23 @@ class Board:
 
     # Captures relevant click information. Returns none if outside bound of Sudoku board, meaning it was one of the buttons
     def click(self, x, y):
-        if x < 600 and y < 600:
+        if x < self.grid_size and y < self.grid_size:
             row = y // self.cell_size
             col = x // self.cell_size
             return row, col
         return None
 
-    # Sets the selected cell
-    def select(self, row, col):
-        self.selected_cell = (row, col)
-
-    # Adds number to the cell
-    def sketch(self, number):
-        if self.selected_cell:
-            row, col = self.selected_cell
-            if self.fixed_board[row][col] is None:
-                if self.board[row][col] != int(number):
-                    self.entered_numbers[row][col] = False
-                self.board[row][col] = int(number)
-
-    # Places the users number in
-    def place_number(self, number):
-        if self.selected_cell:
-            row, col = self.selected_cell
-            if self.fixed_board[row][col] is None:
-                self.board[row][col] = int(number)
-
-    # Logic for resetting the board, removing current numbers. Utilizing deep copy method
-    def reset_to_original(self, screen):
-        self.board = [row[:] for row in self.board_backup]
-        self.fixed_board = [row[:] for row in self.fixed_board_backup]
-        self.selected_cell = None
-
-        screen.fill((255, 255, 255))
-
-        self.draw(screen)
-
-        # Update the display
-        pygame.display.update()
-
-    # Check if all numbers entered are selected + dark blue
-    def all_numbers_entered(self):
-        for i in range(self.rows):
-            for j in range(self.cols):
-                if (
-                    self.board[i][j] != 0
-                    and not self.entered_numbers[i][j]
-                    and self.fixed_board[i][j] is None
-                ):
-                    return False
-        return True
-
-    # Checks if board is full
-    def is_full(self):
-        for row in self.board:
-            if 0 in row:
-                return False
-        return True
-
-    # Check if board is valid
-    def valid_board(self):
-        for row in range(self.rows):
-            if not self.valid_row(row):
-                return False
-        for col in range(self.cols):
-            if not self.valid_col(col):
-                return False
-        for row in range(0, self.rows, 3):
-            for col in range(0, self.cols, 3):
-                if not self.valid_box(row, col):
-                    return False
-        return True
-
-    def valid_row(self, row):
-        nums = set()
-        for num in self.board[row]:
-            if num != 0:
-                if num in nums:
-                    return False
-                nums.add(num)
-        return True
-
-    def valid_col(self, col):
-        nums = set()
-        for row in range(self.rows):
-            num = self.board[row][col]
-            if num != 0:
-                if num in nums:
-                    return False
-                nums.add(num)
-        return True
-
-    def valid_box(self, start_row, start_col):
-        nums = set()
-        for row in range(start_row, start_row + 3):
-            for col in range(start_col, start_col + 3):
-                num = self.board[row][col]
-                if num != 0:
-                    if num in nums:
-                        return False
-                    nums.add(num)
-        return True
-
-    #  Captures arrow movement between each cell
-    def move_arrow(self, direction):
-        if self.selected_cell:
-            row, col = self.selected_cell
-            if direction == "UP" and row > 0:
-                row -= 1
-            elif direction == "DOWN" and row < self.rows - 1:
-                row += 1
-            elif direction == "LEFT" and col > 0:
-                col -= 1
-            elif direction == "RIGHT" and col < self.cols - 1:
-                col += 1
-            self.selected_cell = (row, col)
-        else:
-            self.selected_cell = (0, 0)
-
 
 # Draws the game when game mode is entered
 def draw_game_over_screen(screen, game_won):
-    font = pygame.font.Font(None, 100)
     text_color = (255, 69, 0) if not game_won else (30, 144, 255)
-    text = font.render("Game Over" if not game_won else "You Win!", True, text_color)
+    text = render_cache.text(
+        "Game Over" if not game_won else "You Win!", 100, text_color
+    )
     screen.blit(text, (screen.get_width() // 2 - text.get_width() // 2, 250))
 
-    button_font = pygame.font.Font(None, 50)
-    restart_text = button_font.render("Restart", True, (255, 255, 255))
-    exit_text = button_font.render("Exit", True, (255, 255, 255))
+    restart_text = render_cache.text("Restart", 50, (255, 255, 255))
+    exit_text = render_cache.text("Exit", 50, (255, 255, 255))
 
     button_color = (255, 69, 0)
     button_hover_color = (255, 140, 0)
@@ -410,47 +423,183 @@ def draw_game_over_screen(screen, game_won):
     )
 
 
+# Counts frames and CPU time so the main loop can report frames per second and CPU usage
+class LoopStats:
+    def __init__(self, interval=0):
+        self.interval = interval
+        self.frames = 0
+        self.total_frames = 0
+        self.window_start = time.perf_counter()
+        self.cpu_start = time.process_time()
+
+    # Call once for every frame that actually drew something
+    def frame(self):
+        self.frames += 1
+        self.total_frames += 1
+
+    # Frames per second and CPU usage (percent of one core) since the window started
+    def snapshot(self):
+        elapsed = max(time.perf_counter() - self.window_start, 1e-9)
+        cpu = time.process_time() - self.cpu_start
+        return {
+            "fps": self.frames / elapsed,
+            "cpu_percent": 100 * cpu / elapsed,
+            "frames": self.total_frames,
+        }
+
+    # Milliseconds until the next log line is due, or 0 if logging is off
+    def ms_until_log(self):
+        if not self.interval:
+            return 0
+        remaining = self.window_start + self.interval - time.perf_counter()
+        return max(1, int(remaining * 1000))
+
+    # Logs a line and starts a new window once interval seconds have passed
+    def maybe_log(self):
+        if not self.interval:
+            return
+        if time.perf_counter() - self.window_start < self.interval:
+            return
+        stats = self.snapshot()
+        logging.getLogger("sudoku").info(
+            "fps=%.1f cpu=%.1f%% frames=%d",
+            stats["fps"],
+            stats["cpu_percent"],
+            stats["frames"],
+        )
+        if metrics.enabled:
+            logging.getLogger("sudoku").info("metrics %s", metrics.log_line())
+        self.frames = 0
+        self.window_start = time.perf_counter()
+        self.cpu_start = time.process_time()
+
+
 # Main function instantiating the game logic
-def main():
-    screen = pygame.display.set_mode((800, 800))
-    pygame.display.set_caption("Sudoku")
+# event_driven blocks on pygame.event.wait while nothing on screen needs to change;
+# otherwise the loop polls, capped at fps. stats_interval (seconds) logs fps and CPU usage
+# size is the number of rows/columns of the boards played (any perfect square)
+# store_path is a puzzle store (see puzzle_store.py) to draw boards from before generating
+# session_path is where the game in progress is checkpointed; with resume, a game saved
+# there is reopened on start
+def main(
+    event_driven=True,
+    fps=60,
+    stats_interval=0,
+    size=9,
+    store_path=STORE_PATH,
+    session_path=SESSION_PATH,
+    resume=True,
+):
+    screen = open_window()
+    clock = pygame.time.Clock()
+    stats = LoopStats(stats_interval)
+    # Menu and game over screens are static, so they are only drawn when first shown
+    drawn_scene = None
+
+    # Pre-generates puzzles in the background while the menu is showing
+    difficulties = {
+        difficulty: removed_for(difficulty, size) for difficulty in DIFFICULTIES
+    }
+    pool = PuzzlePool(generate_puzzle, difficulties, size)
+    pool.start()
+    store = None
+    if store_path and os.path.exists(store_path):
+        store = PuzzleStore(store_path)
+    autosaver = None
+    if session_path:
+        autosaver = Autosaver(session_path)
+        autosaver.start()
+
+    def new_board(difficulty="easy", session=None):
+        board = Board(size, size, difficulty, pool, store, session)
+        board.autosaver = autosaver
+        return board
 
     game_start_state = True
     game_over = False
     game_won = False
     board = None
+    if autosaver is not None and resume:
+        session = load_session(session_path)
+        if session is not None and session.grid.size == size:
+            board = new_board(session=session)
+            game_start_state = False
 
     while True:
-        screen.fill((255, 255, 255))
-
+        drew = False
         if game_start_state:
-            button_rect_1, button_rect_2, button_rect_3 = game_start(screen)
+            if drawn_scene != "start":
+                button_rect_1, button_rect_2, button_rect_3 = game_start(screen)
+                pygame.display.flip()
+                drawn_scene = "start"
+                drew = True
         elif game_over:
-            draw_game_over_screen(screen, game_won)
+            if drawn_scene != "game_over":
+                screen.fill((255, 255, 255))
+                draw_game_over_screen(screen, game_won)
+                pygame.display.flip()
+                drawn_scene = "game_over"
+                drew = True
         else:
-            board.draw(screen)
-            if board.is_full() and board.all_numbers_entered():
-                if board.valid_board():
-                    game_won = True
-                else:
-                    game_won = False
+            # Only the cells that changed are drawn and pushed to the display
+            draw_start = time.perf_counter()
+            dirty_rects = board.draw_dirty(screen)
+            if dirty_rects:
+                pygame.display.update(dirty_rects)
+                drew = True
+                metrics.observe("main.draw", (time.perf_counter() - draw_start) * 1000)
+            drawn_scene = "board"
+            with metrics.timer("main.win_check"):
+                finished = board.is_full() and board.all_numbers_entered()
+            if finished:
+                game_won = board.is_solved()
                 game_over = True
+                # A finished game is not resumed
+                if autosaver is not None:
+                    autosaver.discard()
+
+        if drew:
+            stats.frame()
+        stats.maybe_log()
+
+        # The win check can switch to the game over screen, which still has to be drawn
+        idle = not (game_over and drawn_scene != "game_over")
+        if event_driven and idle:
+            if drew:
+                # Still cap the frame rate while input keeps the screen changing
+                clock.tick(fps)
+            # Nothing left to draw: sleep until input arrives or the next log line is due
+            event = pygame.event.wait(stats.ms_until_log())
+            events = (
+                [event] + pygame.event.get() if event.type != pygame.NOEVENT else []
+            )
+        else:
+            events = pygame.event.get()
+            clock.tick(fps)
 
-        for event in pygame.event.get():
+        events_start = time.perf_counter()
+        for event in events:
             if event.type == pygame.QUIT:
+                if board is not None and not game_over:
+                    board.checkpoint(now=True)
                 pygame.quit()
                 sys.exit()
+            elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                # The window contents were lost, so everything is redrawn
+                drawn_scene = None
+                if board is not None:
+                    board.full_redraw = True
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 if game_start_state:
                     mouse_pos = event.pos
                     if button_rect_1.collidepoint(mouse_pos):
-                        board = Board(9, 9, "easy")
+                        board = new_board("easy")
                         game_start_state = False
                     elif button_rect_2.collidepoint(mouse_pos):
-                        board = Board(9, 9, "medium")
+                        board = new_board("medium")
                         game_start_state = False
                     elif button_rect_3.collidepoint(mouse_pos):
-                        board = Board(9, 9, "hard")
+                        board = new_board("hard")
                         game_start_state = False
                 elif game_over:
                     mouse_pos = event.pos
@@ -466,11 +615,9 @@ def main():
                     if board.click(mouse_pos[0], mouse_pos[1]) is not None:
                         row, col = board.click(mouse_pos[0], mouse_pos[1])
                         board.select(row, col)
-                        board.draw(screen)
                     else:
                         if board.handle_button_click(mouse_pos, screen):
-                            screen = pygame.display.set_mode((800, 800))
-                            pygame.display.set_caption("Sudoku")
+                            screen = open_window()
                             game_start_state = True
                             game_over = False
                             game_won = False
@@ -478,41 +625,132 @@ def main():
 
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_ESCAPE:
-                    if game_over:
-                        game_start_state = True
-                        game_over = False
-                        board = None
-                    else:
-                        game_start_state = True
-                        game_over = False
-                        board = None
-                elif event.key == pygame.K_UP:
-                    board.move_arrow("UP")
-                elif event.key == pygame.K_DOWN:
-                    board.move_arrow("DOWN")
-                elif event.key == pygame.K_LEFT:
-                    board.move_arrow("LEFT")
-                elif event.key == pygame.K_RIGHT:
-                    board.move_arrow("RIGHT")
-                elif event.key in (
-                    pygame.K_1,
-                    pygame.K_2,
-                    pygame.K_3,
-                    pygame.K_4,
-                    pygame.K_5,
-                    pygame.K_6,
-                    pygame.K_7,
-                    pygame.K_8,
-                    pygame.K_9,
-                ):
-                    board.sketch(event.key - pygame.K_0)
-
-                elif event.key == pygame.K_RETURN:
-                    if board.enter_number(screen, row, col):
-                        pygame.display.flip()
-
-        pygame.display.flip()
+                    if board is not None and not game_over:
+                        board.checkpoint(now=True)
+                    game_start_state = True
+                    game_over = False
+                    board = None
+                # Every other key acts on the board, so only while a game is played
+                elif board is not None and not game_over:
+                    if event.key == pygame.K_UP:
+                        board.move_arrow("UP")
+                    elif event.key == pygame.K_DOWN:
+                        board.move_arrow("DOWN")
+                    elif event.key == pygame.K_LEFT:
+                        board.move_arrow("LEFT")
+                    elif event.key == pygame.K_RIGHT:
+                        board.move_arrow("RIGHT")
+                    # Ctrl+Z undoes, Ctrl+Y or Ctrl+Shift+Z redoes
+                    elif event.key == pygame.K_z and event.mod & pygame.KMOD_CTRL:
+                        if event.mod & pygame.KMOD_SHIFT:
+                            board.redo()
+                        else:
+                            board.undo()
+                    elif event.key == pygame.K_y and event.mod & pygame.KMOD_CTRL:
+                        board.redo()
+                    elif event.key in (
+                        pygame.K_1,
+                        pygame.K_2,
+                        pygame.K_3,
+                        pygame.K_4,
+                        pygame.K_5,
+                        pygame.K_6,
+                        pygame.K_7,
+                        pygame.K_8,
+                        pygame.K_9,
+                    ):
+                        board.sketch(event.key - pygame.K_0)
+                    # On boards larger than 9x9, letters A, B, C... enter 10, 11, 12...
+                    elif (
+                        board.rows > 9 and 0 <= event.key - pygame.K_a < board.rows - 9
+                    ):
+                        board.sketch(event.key - pygame.K_a + 10)
+
+                    elif event.key == pygame.K_RETURN:
+                        board.enter_number()
+                    elif event.key in (pygame.K_h, pygame.K_SLASH):
+                        board.hint()
+
+        if events:
+            metrics.observe("main.events", (time.perf_counter() - events_start) * 1000)
+            metrics.add("main.event_count", len(events))
+
+        # Snapshot the game after input; the autosaver writes it from its own thread
+        if board is not None and not game_start_state and not game_over:
+            board.checkpoint()
 
 
 if __name__ == "__main__":
-    main()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Sudoku")
+    parser.add_argument(
+        "--poll",
+        action="store_true",
+        help="poll for events every frame instead of sleeping while idle",
+    )
+    parser.add_argument(
+        "--size",
+        type=int,
+        default=9,
+        help="rows/columns of the board: 4, 9, 16 or 25",
+    )
+    parser.add_argument("--fps", type=int, default=60, help="frame rate cap")
+    parser.add_argument(
+        "--store",
+        default=STORE_PATH,
+        metavar="PATH",
+        help="puzzle store to draw boards from (built with puzzle_store.py)",
+    )
+    parser.add_argument(
+        "--session",
+        default=SESSION_PATH,
+        metavar="PATH",
+        help="file the game in progress is saved to and resumed from",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="JSON",
+        nargs="?",
+        const="-",
+        help="record timings and counters; written to JSON on exit (- for the log), "
+        "and logged every --stats SECONDS",
+    )
+    parser.add_argument(
+        "--new",
+        action="store_true",
+        help="start at the menu instead of resuming a saved game",
+    )
+    parser.add_argument(
+        "--stats",
+        type=float,
+        default=0,
+        metavar="SECONDS",
+        help="log fps and CPU usage every SECONDS",
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    if args.profile:
+        import atexit
+
+        metrics.enable()
+        if args.profile == "-":
+            atexit.register(
+                lambda: logging.getLogger("sudoku").info(
+                    "metrics\n%s\n%s\n%s",
+                    metrics.to_json(histograms=False),
+                    metrics.format_histogram("main.draw"),
+                    metrics.format_histogram("generator.generate"),
+                )
+            )
+        else:
+            atexit.register(metrics.dump, args.profile)
+    main(
+        event_driven=not args.poll,
+        fps=args.fps,
+        stats_interval=args.stats,
+        size=args.size,
+        store_path=args.store,
+        session_path=args.session,
+        resume=not args.new,
+    )